@@ -0,0 +1,137 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from disk_cache import DiskCache
+import process_runner
+
+# qacct executable, can point to a local fake script for testing
+QACCT = os.environ.get("AEROX_QACCT", "qacct")
+QACCT_TIMEOUT = 120
+
+# Finished jobs never change in the accounting file, records are kept forever
+_cache = DiskCache("qacct")
+
+# Date formats printed by the different SGE versions
+_DATE_FORMATS = ['%a %b %d %H:%M:%S %Y', '%m/%d/%Y %H:%M:%S.%f', '%m/%d/%Y %H:%M:%S']
+
+
+class AccountingRecord:
+    """The qacct fields used by the workflow for one job."""
+
+    def __init__(self, job_id, owner=None, qsub_time=None, start_time=None, end_time=None) -> None:
+        self.job_id = str(job_id)
+        self.owner = owner
+        self.qsub_time = qsub_time
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def __repr__(self) -> str:
+        return f"AccountingRecord({self.job_id}, owner={self.owner}, elapsed={self.elapsed_time})"
+
+    @property
+    def elapsed_time(self):
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+    def to_dict(self):
+        def iso(date):
+            return date.isoformat() if date else None
+        return {'job_id': self.job_id, 'owner': self.owner, 'qsub_time': iso(self.qsub_time),
+                'start_time': iso(self.start_time), 'end_time': iso(self.end_time)}
+
+    @classmethod
+    def from_dict(cls, values):
+        def date(value):
+            return datetime.fromisoformat(value) if value else None
+        return cls(values['job_id'], values.get('owner'), date(values.get('qsub_time')),
+                   date(values.get('start_time')), date(values.get('end_time')))
+
+
+def parse_date(value):
+    """Parses a qacct date, returns None for unset dates (-/-) or unknown formats."""
+    value = (value or "").strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_qacct_output(output):
+    """
+    Parses qacct -j output into a list of {key: value} dicts, one per record.
+    Records are separated by ==== lines, each line is '<key> <value>'.
+    """
+    records = []
+    fields = None
+    for line in output.splitlines():
+        if line.startswith("="):
+            fields = {}
+            records.append(fields)
+            continue
+        parts = line.split(None, 1)
+        if not parts:
+            continue
+        if fields is None:
+            fields = {}
+            records.append(fields)
+        fields[parts[0]] = parts[1].strip() if len(parts) == 2 else ""
+    return records
+
+
+def record_from_fields(job_id, fields):
+    return AccountingRecord(job_id,
+                            owner=fields.get('owner'),
+                            qsub_time=parse_date(fields.get('qsub_time')),
+                            start_time=parse_date(fields.get('start_time')),
+                            end_time=parse_date(fields.get('end_time')))
+
+
+def lookup(job_id, use_cache=True):
+    """
+    Returns the AccountingRecord of a finished job, None if qacct does not know the job.
+    When a job id has several records (rerun), the last one is used.
+    """
+    job_id = str(job_id)
+    if use_cache:
+        cached = _cache.get(job_id)
+        if cached:
+            return AccountingRecord.from_dict(cached)
+    result = process_runner.run([QACCT, '-j', job_id], QACCT_TIMEOUT)
+    records = [fields for fields in parse_qacct_output(result.stdout) if fields]
+    if not result.ok:
+        print(result.describe_failure())
+        return None
+    if not records:
+        print(f"qacct -j {job_id} returned no record")
+        return None
+    record = record_from_fields(job_id, records[-1])
+    if use_cache and record.end_time is not None:
+        _cache.set(job_id, record.to_dict())
+    return record
+
+
+def lookup_many(job_ids, use_cache=True, max_workers=4):
+    """
+    Looks up several jobs concurrently.
+    Returns {job_id: AccountingRecord or None}, None job ids are ignored.
+    """
+    job_ids = list(dict.fromkeys(str(job_id) for job_id in job_ids if job_id is not None))
+    records = {}
+    if not job_ids:
+        return records
+
+    def safe_lookup(job_id):
+        try:
+            return lookup(job_id, use_cache)
+        except Exception as e:
+            print(f"Error reading the job info {job_id}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(job_ids))) as executor:
+        for job_id, record in zip(job_ids, executor.map(safe_lookup, job_ids)):
+            records[job_id] = record
+    return records
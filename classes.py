@@ -2,8 +2,14 @@ from functools import wraps
 import re
 import traceback
 import configparser
+import os
+import sys
 from typing import List
-from common import*
+from common import (exit_workflow, get_basename, get_previous_step, make_dir, run_command, run_commands,
+					set_mode_bits, simple_exit)
+from disk_cache import DiskCache
+from log import Log
+import timing
 
 def set_log(copylogger : Log ):
 	global logger
@@ -226,6 +232,86 @@ class WorkflowConfig:
 			simple_exit("Workflow config - Invalid parameter {0}: {1}".format("template_root_dir", value))
 		self._template_root_dir = value
 
+class OptionLists:
+
+	# solver versions and queues provided by the Atos scripts,
+	# fetched once per process
+	_outputs = {}
+	# the lists change about once a month, script outputs are kept on disk for a day
+	ttl = 24 * 3600
+	_cache = DiskCache("option_lists")
+
+	@staticmethod
+	def commands():
+		return {
+			"solver_versions": [os.path.join(Uniq.config.optionsds, Uniq.config.solver_versions),
+								Uniq.default_solver],
+			# TODO: create a script (or a config file) to provide queues
+			# instead of using ac_StarCcmListQueues.sh
+			"queues": [os.path.join(Uniq.config.optionsds, Uniq.config.list_queues)],
+		}
+
+	@classmethod
+	def prefetch(cls):
+		""" Load the lists from the disk cache, run the scripts of the missing ones concurrently. """
+		commands = {}
+		for name, argv in cls.commands().items():
+			if name not in cls._outputs and not cls._load_cached(name, argv):
+				commands[name] = argv
+		outputs = run_commands(list(commands.values()))
+		for name, output in zip(commands.keys(), outputs):
+			cls._store(name, commands[name], output)
+
+	@classmethod
+	def get_output(cls, name):
+		if name not in cls._outputs:
+			argv = cls.commands()[name]
+			if not cls._load_cached(name, argv):
+				cls._store(name, argv, run_command(argv))
+		return cls._outputs[name]
+
+	@classmethod
+	def _load_cached(cls, name, argv) -> bool:
+		if Uniq.refresh_lists:
+			return False
+		output = cls._cache.get(" ".join(argv), ttl=cls.ttl)
+		if not output:
+			return False
+		logger.log_event("info", "Using cached output of " + " ".join(argv))
+		cls._outputs[name] = output
+		return True
+
+	@classmethod
+	def _store(cls, name, argv, output):
+		cls._outputs[name] = output
+		# an empty output is a failed script run, the next submission runs it again
+		if output:
+			cls._cache.set(" ".join(argv), output)
+
+	@classmethod
+	def solver_versions(cls):
+		versions = []
+		for e in cls.get_output("solver_versions").split("\n"):
+			versions.extend(e.split(";"))
+		return versions
+
+	@classmethod
+	def queues(cls):
+		""" Return {queue name: grid engine queue}. """
+		available_queues = {}
+		for keyValue in cls.get_output("queues").split("\n"):
+			keyValue = keyValue.split(";", 1)
+			if len(keyValue) == 2 and keyValue[0] != "" and keyValue[1] != "":
+				available_queues[keyValue[1].lower()] = keyValue[0]
+
+		# Temporary add aerox-india queue 27/02/2023
+		available_queues["aerox-india"] = "aeroxindia.q"
+		return available_queues
+
+	@classmethod
+	def clear(cls):
+		cls._outputs = {}
+
 class WorkflowArgs:
 
 	def __init__(self) -> None:
@@ -244,7 +330,9 @@ class WorkflowArgs:
 		self._iterator = None
 		self._template = None
 
+	@timing.timed("workflow_args")
 	def set_members(self, dict : dict):
+		OptionLists.prefetch()
 		self.project_code 	= dict.get("PROJECT_CODE")
 		self.task_code      = dict.get("TASK_CODE")
 		self.description 	= dict.get("DESCRIPTION")
@@ -303,16 +391,7 @@ class WorkflowArgs:
 	@not_none()
 	def solver_version(self, value):
 		"""   """
-		script = os.path.join(
-			Uniq.config.optionsds,
-			Uniq.config.solver_versions
-		)
-		cmd = "{0} {1}".format(script, Uniq.default_solver)
-		output = run_command(cmd)
-		versions = []
-		for e in output.split("\n"):
-			versions.extend(e.split(";"))
-		if not value in versions:
+		if not value in OptionLists.solver_versions():
 			simple_exit("Invalid solver version")
 		self._solver_version = value
 
@@ -334,19 +413,7 @@ class WorkflowArgs:
 	@queue.setter
 	@not_none()
 	def queue(self, value):
-		# TODO: create a script (or a config file) to provide queues
-		# instead of using ac_StarCcmListQueues.sh
-		cmd = os.path.join(Uniq.config.optionsds, Uniq.config.list_queues)
-		output = run_command(cmd).split("\n")
-
-		available_queues = {}
-		for keyValue in output:
-			keyValue = keyValue.split(";", 1)
-			if len(keyValue) == 2 and keyValue[0] != "" and keyValue[1] != "":
-				available_queues[keyValue[1].lower()] = keyValue[0]
-
-		# Temporary add aerox-india queue 27/02/2023
-		available_queues["aerox-india"] = "aeroxindia.q"
+		available_queues = OptionLists.queues()
 		value = value.lower()
 		if value in available_queues:
 			value = available_queues[value]
@@ -567,7 +634,7 @@ class StarCCM(Files):
 			self.sim = sim_file
 
 	def _retrieve_user_files(self):
-		input_data_file = os.path.join(
+		input_data_file = Uniq.input_data_file or os.path.join(
 			Uniq.user_dir,
 			Uniq.template_input_file
 		)
@@ -697,6 +764,7 @@ class Project:
 			"run_dir: " + self._run_dir,
 			"\n".join([job.__str__() for job in self._jobs])])
 
+	@timing.timed("project")
 	def set_members(self, WA : WorkflowArgs):
 		# --- START OF CHANGE ---
 		if WA.run_number == "DUMMY_XXX_000":
@@ -741,13 +809,12 @@ class Project:
 			previous_job_folder = os.path.join(self.run_dir, previous_step)
 			if os.path.exists(previous_job_folder):
 				logger.log_event("info,terminal", "folder for link exist")
-				cmd = "bash \"{0}\" -f \"{1}\"".format(
+				cmd = ["bash",
 					os.path.join(
 						os.path.dirname(__file__),
 						Uniq.job_state
 					),
-					previous_job_folder
-				)
+					"-f", previous_job_folder]
 				output = run_command(cmd)
 				logger.log_event("info,terminal", "f command output: {0}".format(output))
 				if not "None" in output:
@@ -815,24 +882,24 @@ class SubmitJob:
 		root_dir = Uniq.config.root_dir
 		xf_run_name = Uniq.config.job_launcher
 		xf_Run = os.path.join(root_dir, xf_run_name)
-		software_name = "-s {0}".format(job.software._software)
-		software_version = "-v " + self.WA.solver_version
-		nb_proc = "-n " + "1"
-		input_file = "-i " + "\"" + job.software.sim + "\""
-		job_name = "-j " + "\"" + self.P.name + "\""
-		queue = "-q " + job.queue
-		walltime = "-w \"" + self.WA.walltime + "\""
-		hold = ("-d " + previous_job_id if previous_job_id else "")
-		compress_result = "-e NOZIP"
-		output_dir = "-o " + "\"" + job.path + "\""
-		output_sub_dir = "-os NONE"
-		macros = "-p " + job.software.macro
-		send_mail = "-- mail=false" if Uniq.cleanup else "-- mail=true"
-
-		xf_Run_cmd = " ".join([xf_Run, software_name, software_version,
-			nb_proc, input_file, job_name, queue, walltime, hold,
-			compress_result, output_dir, output_sub_dir,
-			macros, send_mail])
+		software_name = ["-s", job.software._software]
+		software_version = ["-v", self.WA.solver_version]
+		nb_proc = ["-n", "1"]
+		input_file = ["-i", job.software.sim]
+		job_name = ["-j", self.P.name]
+		queue = ["-q", job.queue]
+		walltime = ["-w", self.WA.walltime]
+		hold = (["-d", previous_job_id] if previous_job_id else [])
+		compress_result = ["-e", "NOZIP"]
+		output_dir = ["-o", job.path]
+		output_sub_dir = ["-os", "NONE"]
+		macros = ["-p", job.software.macro]
+		send_mail = ["--", "mail=false"] if Uniq.cleanup else ["--", "mail=true"]
+
+		xf_Run_cmd = [xf_Run] + software_name + software_version +\
+			nb_proc + input_file + job_name + queue + walltime + hold +\
+			compress_result + output_dir + output_sub_dir +\
+			macros + send_mail
 
 		return xf_Run_cmd
 
@@ -840,10 +907,11 @@ class SubmitJob:
 		index = message.lower().index("jobid")
 		return message[index:].split(":")[1].strip()
 
+	@timing.timed("submit")
 	def submit_job(self, previous_job_id=None):
 		for job in self.P.jobs:
 			cmd = self.set_command(job, previous_job_id)
-			logger.log_event("info,terminal", "xf run command: {0}".format(cmd))
+			logger.log_event("info,terminal", "xf run command: {0}".format(" ".join(cmd)))
 			output = run_command(cmd)
 			logger.log_event("info,terminal", "submit job output: {0}".format(output))
 			#stdout = "jobid:10293"
@@ -903,9 +971,13 @@ class Uniq:  # this is a different method to create/use global variables
 
 	user_dir: str = None
 	parameter: str = None
+	# input data file used instead of user_dir/template_input_file (matrix of runs)
+	input_data_file: str = None
 	rerun = False
 	cleanup = False
 	previous_job_id:str = None
+	# ignore the cached solver versions / queues lists
+	refresh_lists = False
 	# default queue for PRE / POST
 	small_queue = "aerox.q"
 	# default solver
@@ -918,4 +990,21 @@ class Uniq:  # this is a different method to create/use global variables
 
 	# at exit
 	atexit_jobs_path: List[str] = []
-	atexit_archives_path: List[str] = []
\ No newline at end of file
+	atexit_archives_path: List[str] = []
+
+	@classmethod
+	def reset(cls):
+		""" Restore the state of a new submission, the constants and the disk caches are kept. """
+		cls.user_dir = None
+		cls.parameter = None
+		cls.input_data_file = None
+		cls.rerun = False
+		cls.cleanup = False
+		cls.previous_job_id = None
+		cls.refresh_lists = False
+		cls.config = None
+		cls.steps = None
+		cls.atexit_jobs_path = []
+		cls.atexit_archives_path = []
+		# reloaded by the next submission, from the disk cache unless refresh_lists is set
+		OptionLists.clear()
\ No newline at end of file
@@ -7,6 +7,7 @@ v1.0
 """
 # from __future__ import annotations
 
+from common import WorkflowError
 from log import Log
 from os import DirEntry
 from pathlib import Path
@@ -16,8 +17,8 @@ import argparse
 import os
 import re
 import shutil
-import subprocess
 import sys
+import workflow
 # import doctest
 
 # global variable
@@ -29,23 +30,11 @@ PROJECTS_PATH: str = "/home/USER/share/_PROJECTS"
 # Utils #
 #########
 
-def run_command(cmd: str, exit_after_error: bool = True) -> str:
-    stdout, stderr = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        universal_newlines=True
-    ).communicate()
-
-    if stderr != "":
-        if exit_after_error:
-            exit_script()
-    return stdout
-
-
 def set_log(log_name: str, log_path: str) -> None:
     global LOGGER
+    # one log per run folder, the previous one is flushed and released
+    if LOGGER is not None:
+        LOGGER.close()
     LOGGER = Log(f"Cleanup-{log_name}", os.path.dirname(log_path))
     sys.stderr = LOGGER.set_log("stderr")
 
@@ -230,19 +219,6 @@ class CleanupHelper:
             return
         return to_be_enmeshed
 
-    @staticmethod
-    def retrieve_job_id(stdout: str) -> Union[str, None]:
-        """
-        This function assumes that the workflow output contains the job id in the following form:
-        'Job submitted with ID: 43079'
-        >>> CleanupHelper.retrieve_job_id('Job submitted with ID: 43079')
-        '43079'
-        """
-        match = re.search(r'(Job submitted with ID: )([0-9]+)', stdout)
-        if match is None:
-            simple_exit("Some problems occurs when job submitted through the workflow, can't retrieve previous job id")
-        return match.group(2)
-
     @staticmethod
     def contains_sim_file(path: str) -> bool:
         """Test if the given folder contains a sim file"""
@@ -312,12 +288,11 @@ class Cleaner:
         1. Retrieve the good sim_file
         2. Copy the parameters_cleanup template file and fill them
         3. Prepare the folder to run through workflow (delete .JOB_STEPS, state files (ABORTED, FINISHED..etc), previous macros)
-        4. Run the workflow command
-        5. Parse workflow output to retrieve previous_job_id for cleanup the next folder
+        4. Submit the job through workflow.submit
+        5. Return the last job id as previous_job_id for cleanup the next folder
         """
         workflow_dir = f"{os.path.dirname(os.path.abspath(__file__))}"
         parameter_file_template = f"{workflow_dir}/parameters_cleanup.txt"
-        workflow_path = f"{workflow_dir}/workflow.py"
 
         step_folder = os.path.join(PROJECTS_PATH, self._project, f"{self._project}-{run_number}", step)
         if not OSHelper.is_owned_by_user(step_folder):
@@ -353,15 +328,19 @@ class Cleaner:
             LOGGER.log_event("info", f"Deleted: {job_steps_path}")
         Cleaner._prepare_folder_clean_workflow(step_folder, step)
 
-        # 4. Run the workflow command
-        cmd = f"python3 {workflow_path} {parameters_file_path} -c " + \
-              (f"-d {previous_job_id}" if previous_job_id else "")
-        stdout = run_command(cmd, False)
-        LOGGER.log_event("info,terminal", f"Running command: {cmd}")
-        LOGGER.log_event("info,terminal", f"Workflow stdout: {stdout}")
-
-        # 5. Parse workflow output to retrieve previous_job_id for cleanup the next folder
-        return CleanupHelper.retrieve_job_id(stdout)
+        # 4. Submit the cleanup job through the workflow, in this process
+        LOGGER.log_event("info,terminal", f"Submitting: {parameters_file_path}"
+                         + (f" after job {previous_job_id}" if previous_job_id else ""))
+        try:
+            result = workflow.submit(parameters_file_path, cleanup=True, previous_job_id=previous_job_id)
+        except WorkflowError as e:
+            simple_exit(*e.messages)
+        LOGGER.log_event("info,terminal", f"Workflow submitted: {result}")
+
+        # 5. The last job submitted is the previous_job_id for cleanup the next folder
+        if not result.job_ids:
+            simple_exit("Job ID not found")
+        return result.job_ids[-1]
 
     @staticmethod
     def _purge_step(path: str, step: str) -> Union[str, None]:
@@ -1,14 +1,20 @@
 import sys 
 import os 
 import shutil
-import subprocess
+import process_runner
+import timing
 from log import Log 
 
 #######
 # LOG #
 #######
+logger: Log = None
+
 def set_log(log_path) -> None:
 	global logger 
+	# one log per submission, the previous one is flushed and released
+	if logger is not None:
+		logger.close()
 	logger = Log("Workflow", os.path.dirname(log_path))
 	sys.stderr = logger.set_log("stderr")
 
@@ -18,30 +24,47 @@ def get_logger() -> Log:
 ########
 # EXIT # 
 ########
+class WorkflowError(Exception):
+	""" Raised when the job cannot be submitted, its messages are already logged. """
+
+	def __init__(self, *msgs) -> None:
+		super().__init__(" ".join(str(msg) for msg in msgs) or "Job not submitted")
+		self.messages = list(msgs)
+
 def simple_exit(*msgs) -> None: 
 	for msg in msgs:
 		logger.log_event("error,terminal", msg)
-	exit_workflow() 
+	exit_workflow(*msgs) 
 
-def exit_workflow() -> None:
+def exit_workflow(*msgs) -> None:
+	""" Stop the submission: raises WorkflowError, the command line entry points exit with status 1. """
 	logger.log_event("error,terminal", "Job not submitted")
-	exit(1)
+	raise WorkflowError(*msgs)
 
 #########
 # SHELL # 
 #########
-def run_command(cmd, exit_after_error=True) -> str:
-	logger.log_event("info", "Running command: " + cmd)
-	stdout, stderr = subprocess.Popen(cmd, 
-									  stdout=subprocess.PIPE,
-									  stderr=subprocess.PIPE, 
-									  shell=True, 
-									  universal_newlines=True).communicate()
-	if stderr != "":
-		logger.log_event("error,terminal", stderr)
+def run_command(argv, exit_after_error=True, timeout=process_runner.DEFAULT_TIMEOUT, env=None) -> str:
+	logger.log_event("info", "Running command: " + " ".join(argv))
+	result = process_runner.run(argv, timeout, env=env)
+	return _check_command(result, exit_after_error)
+
+def run_commands(commands, exit_after_error=True, timeout=process_runner.DEFAULT_TIMEOUT) -> list:
+	""" Run independent commands concurrently, return their stdout in the same order. """
+	for argv in commands:
+		logger.log_event("info", "Running command: " + " ".join(argv))
+	results = process_runner.run_many(commands, timeout)
+	return [_check_command(result, exit_after_error) for result in results]
+
+def _check_command(result, exit_after_error) -> str:
+	logger.log_event("info", "Command done in {0:.2f}s: {1}".format(result.wall_time, result.command_line))
+	if not result.ok:
+		logger.log_event("error,terminal", result.describe_failure())
 		if exit_after_error: 
 			exit_workflow() 
-	return stdout 
+	elif result.stderr != "":
+		logger.log_event("warning", result.stderr)
+	return result.stdout 
 
 #########
 # FILES #
@@ -60,6 +83,7 @@ def copy_file(src, dst, error_message, ignore=False):
 		shutil.copy(src, dst)	
 	except Exception as e: 
 		simple_exit(error_message, e)
+	timing.add_bytes_copied(os.path.getsize(dst))
 
 def make_dir(path, error_message): 
 	try:	
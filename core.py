@@ -1,24 +1,29 @@
 from datetime import datetime
+import getpass
+import hashlib
 import os
-from classes import*
-from common import*
+from classes import ConfigParser, Job, Project, Regex, StarCCM, Uniq, WorkflowArgs, WorkflowConfig
+from disk_cache import DiskCache
+from common import copy_file, get_basename, get_previous_step, make_dir, rename, run_command, simple_exit
+from log import Log
+import job_monitor
+import qstat
+import timing
 
 def set_log(copylogger : Log ):
 	global logger 
 	logger = copylogger
 
-def set_cron_job(P: Project): 
-	script = os.path.join(
-		os.path.dirname(__file__), 
-        Uniq.job_state
-	)
-	args = []
-	for job in P.jobs: 
-		args.append("\"{0},{1}\"".format(os.path.basename(job.path), job.id)) 
-	cmd = "bash {0} --add \"{1}\" {2}".format(script, P.run_dir, " ".join(args))
-	logger.log_event("info,terminal", "cron cmd: {0}".format(cmd)) 
-	run_command(cmd)
+@timing.timed("cron_registration")
+def set_job_monitor(P: Project):
+	infos = [(os.path.basename(job.path), job.id) for job in P.jobs]
+	job_monitor.add_job_infos(P.run_dir, infos)
+	job_monitor.register(P.run_dir)
+	logger.log_event("info,terminal", "job monitor: {0} {1}".format(P.run_dir, infos))
+	if job_monitor.ensure_running():
+		logger.log_event("info", "job monitor started")
 
+@timing.timed("config_load")
 def set_workflow_config():
     # Uniq.workflow_config can now be an absolute path (set by tests) or a relative path.
     if os.path.isabs(Uniq.workflow_config):
@@ -40,10 +45,62 @@ def set_workflow_config():
     config.set_members(parsed_sections)
     Uniq.config = config
 
+# variables set by the global env rc file, see set_system_global_env
+_global_env_cache = DiskCache("global_env")
+# shell bookkeeping, never cached nor replayed
+SHELL_VARIABLES = ("PWD", "OLDPWD", "SHLVL", "_")
+
+# environment of the process before any rc file output is applied, see inherited_env
+_inherited_env = None
+
+def inherited_env():
+	"""
+	Environment the rc file is sourced in, without the shell bookkeeping variables.
+	Taken once per process before set_system_global_env changes os.environ:
+	later submissions of the same process (matrix, cleanup) source and key on the same one.
+	"""
+	global _inherited_env
+	if _inherited_env is None:
+		_inherited_env = {name: value for name, value in os.environ.items() if name not in SHELL_VARIABLES}
+	return _inherited_env
+
+def global_env_key(rc_path):
+	"""
+	Cache key of the rc file: changes with its path, mtime or content, with the user
+	and with the inherited environment (the rc file may depend on it).
+	"""
+	try:
+		with open(rc_path, "rb") as file:
+			digest = hashlib.sha256(file.read()).hexdigest()
+		mtime = os.stat(rc_path).st_mtime_ns
+	except OSError as e:
+		simple_exit("Cannot read global env file {0}".format(rc_path), e)
+	env_digest = hashlib.sha256("\0".join(
+		"{0}={1}".format(name, value) for name, value in sorted(inherited_env().items())).encode()).hexdigest()
+	return "{0}|{1}|{2}|{3}|{4}".format(os.path.abspath(rc_path), mtime, digest, getpass.getuser(), env_digest)
+
+def source_global_env(rc_path):
+	""" Source the rc file in a shell started with the inherited environment, return the variables it adds or changes. """
+	inherited = inherited_env()
+	cmd = ["/bin/sh", "-c", ". \"$1\" && env -0", "sh", rc_path]
+	stdout = run_command(cmd, env=inherited)
+	env = dict(entry.split("=", 1) for entry in stdout.split("\0") if "=" in entry)
+	return {name: value for name, value in env.items()
+			if name not in SHELL_VARIABLES and inherited.get(name) != value}
+
+@timing.timed("env_sourcing")
 def set_system_global_env():
-	cmd = ". {0} && env".format(Uniq.config.global_env)
-	stdout = run_command(cmd)
-	env = dict((line.split("=", 1) for line in stdout.splitlines() if "=" in line)) # Ensure split is possible
+	rc_path = Uniq.config.global_env
+	key = global_env_key(rc_path)
+	env = _global_env_cache.get(key)
+	if env is None:
+		env = source_global_env(rc_path)
+		_global_env_cache.set(key, env)
+	elif all(os.environ.get(name) == value for name, value in env.items()):
+		logger.log_event("info", "Environment of {0} already set".format(rc_path))
+		return
+	else:
+		logger.log_event("info", "Using cached environment of {0}".format(rc_path))
 	try:
 		os.environ.update(env)
 	except Exception as e: 
@@ -64,27 +121,35 @@ def update_table(table, WA, P):
     print(f"Updating table {table} for workstep with args {WA}, project {P}")
     # ... Place table copying/creation logic here ...
 
+@timing.timed("hold_job_id")
 def get_hold_job_id(P: Project): 
+	"""
+	Returns the job id the first step must wait for, None if there is none.
+	Exits if a step of the previous submission ended with an error.
+	"""
 	if P.jobs[0].software.sim:
 		return None 
-	cmd = "bash \"{0}\" -w \"{1}\" \"{2}\"".format(
-		os.path.join( 
-			os.path.dirname(os.path.abspath(__file__)), 
-			Uniq.job_state
-		), 
-		P.run_dir, 
-		get_previous_step(Uniq.steps[0]))  
-	output = run_command(cmd)
-	logger.log_event("info,terminal", "INFO - BASH -W OUTPUT: {0}".format(output)) 
-	if "STOP" in output:
+	previous_step = get_previous_step(Uniq.steps[0])
+	open(os.path.join(P.run_dir, job_monitor.JOB_STEPS), "a").close()
+	if previous_step and not os.path.isdir(os.path.join(P.run_dir, previous_step)):
 		simple_exit("Previous job error")
-	lines = output.split("\n") 
-	if len(lines) > 1 and lines[1] == "":
-		return None 
-	if not Regex.match(lines[1], Regex.numbers):
+	job_infos = job_monitor.read_job_infos(P.run_dir)
+	if not job_infos:
+		return None
+	try:
+		snapshot = qstat.get_snapshot()
+	except qstat.QstatError as e:
+		simple_exit("Cannot retrieve the state of the previous jobs", e)
+	for step, job_id in job_infos:
+		status = job_monitor.detect_job_status(os.path.join(P.run_dir, step), job_id, snapshot)
+		logger.log_event("info", "previous job {0} {1} status: {2}".format(step, job_id, status))
+		if status > job_monitor.FINISHED:
+			simple_exit("Previous job error")
+	hold_job_id = job_infos[-1][1]
+	if not Regex.match(hold_job_id, Regex.numbers):
 		logger.log_event("info,terminal", "INFO - Cannot retrieve previous job id")
 		return None 
-	return lines[1] 
+	return hold_job_id 
 
 
 # ignore None job path 
@@ -199,6 +264,7 @@ class JobArchive:
 
 				
 
+	@timing.timed("archive")
 	def archive(self, P: Project):
 		for job in P.jobs: 
 			self.files = job.software.get_files() 
@@ -244,6 +310,7 @@ def copy_template(job: Job, name):
 			copy_file(job.software.sim, dst_file, "Cannot copy file {0}".format(file), True) 
 			job.software.sim = dst_file 
 
+@timing.timed("copy_templates")
 def copy_templates(P : Project): 
 	for job in P.jobs:
 		copy_template(job, P.name) 
@@ -254,6 +321,7 @@ def create_dummy_sim_file(job: Job, P: Project):
 	open(dummy_sim_file, "w").close() 
 	return dummy_sim_file
 
+@timing.timed("symlink")
 def sim_file_handler(P: Project): 
 	# 1 - job steps do not exist -> check if previous step path exist -> create symlink 
 	# 2 - job steps exist -> previous step inside -> create dummy file (risk of collision but ignore for now)
@@ -300,19 +368,19 @@ def create_symlink(job_path, step):
 	if not os.path.exists(previous_step_path): 
 		simple_exit("Missing SIM_FILE parameter or missing previous job folder")
 
-	cmd = "bash \"{0}\" -s \"{1}\"".format(
+	cmd = ["bash",
 		os.path.join( 
 			os.path.dirname(os.path.abspath(__file__)),
 			Uniq.job_state
 		),
-		previous_step_path
-	)
+		"-s", previous_step_path]
 	output = run_command(cmd) 
 	if "ERROR" in output:
 		simple_exit("Cannot create symlink for sim file", output) 
 	logger.log_event("info,terminal", "DEBUG - symlink output: {0}".format(output)) 
 
 
+@timing.timed("copy_post_resource")
 def copy_post_resource(WA:WorkflowArgs, P:Project):
 	"""
 	Copy the xlsm into POST folder and rename it -PROJECT_CODE-JOB_CODE.xlsm
@@ -1,49 +1,174 @@
-import pymysql
+import configparser
 import os
+import threading
+import time
 
-def get_db_connection():
+import pymysql
+
+# Connection settings are read from the [DATABASE] section of the workflow config,
+# AEROX_DB_* environment variables take precedence over the file.
+CONFIG_FILE = os.environ.get(
+    "AEROX_WORKFLOW_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "workflow_config.cfg")
+)
+DEFAULT_SETTINGS = {
+    "host": "localhost",
+    "port": "3306",
+    "user": "root",
+    # no default: AEROX_DB_PASSWORD (or the [DATABASE] section) must provide it
+    "password": None,
+    "database": "dbtest22",
+}
+CONNECT_TIMEOUT = 10
+# Idle connections kept by the pool
+MAX_IDLE = int(os.environ.get("AEROX_DB_POOL_SIZE", "4"))
+# An idle connection is pinged (and reconnected if needed) only after this many seconds
+PING_AFTER = 60
+
+
+class SettingsError(pymysql.err.InterfaceError):
+    """The connection settings are incomplete."""
+
+
+def read_settings(config_file=CONFIG_FILE):
     """
-    Establishes a PyMySQL connection using environment variables for configuration.
-    These environment variables are expected to be set by the test environment (e.g., conftest.py).
-    Falls back to original hardcoded values if environment variables are not set (for non-test execution).
+    Returns the connection settings: defaults < [DATABASE] section < AEROX_DB_* variables.
+    Raises SettingsError when no password is configured.
     """
-    host = "localhost"
-    user = "root"
-    password = "DBpass0rd"
-    database = "dbtest22"
-    port = 3306 # PyMySQL expects port to be an int
-
+    settings = dict(DEFAULT_SETTINGS)
+    config = configparser.ConfigParser(inline_comment_prefixes=("#",))
     try:
-        connection = pymysql.connect(
-            host=host,
-            user=user,
-            password=password,
-            database=database,
-            port=port,
-            connect_timeout=10 # Add a connection timeout
-        )
-        # print(f"Attempting to connect to DB: host={host}, port={port}, user={user}, db={database}")
-        # Test the connection before returning
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-        # print("Database connection successful.")
-        return connection
-    except pymysql.Error as e:
-        print(f"Database connection not successful to {host}:{port}/{database} as user {user}: {e}")
-        # Depending on how critical this is outside tests, you might raise the error
-        # or return None / handle it. For tests, conftest.py handles failures.
-        raise # Re-raise for tests to catch, or for calling code to handle
-
-# The try-except block for printing connection status at import time can be misleading,
-# especially if the DB isn't available during general import but is specifically for functions.
-# It's better to confirm connection when get_db_connection() is actually called.
-# Removing the global print statement.
-# try:
-#     # This would attempt a connection using defaults if env vars not set,
-#     # which might not be desired at import time.
-#     # conn = get_db_connection()
-#     # conn.close()
-#     # print("Able to establish initial DB check (may use defaults or env vars).")
-# except Exception:
-# print("Initial DB check failed (may use defaults or env vars). Connection will be attempted when get_db_connection() is called.")
-    pass
\ No newline at end of file
+        config.read(config_file)
+    except configparser.Error as e:
+        print(f"Cannot read the database settings from {config_file}: {e}")
+    if config.has_section("DATABASE"):
+        settings.update({key: value for key, value in config.items("DATABASE") if key in settings})
+    for key in settings:
+        value = os.environ.get(f"AEROX_DB_{key.upper()}")
+        if value is not None:
+            settings[key] = value
+    if settings["password"] is None:
+        raise SettingsError(f"No database password configured: set AEROX_DB_PASSWORD "
+                            f"or password in the [DATABASE] section of {config_file}")
+    return settings
+
+
+class PooledConnection:
+    """
+    PyMySQL connection borrowed from a ConnectionPool.
+    Behaves like the connection, close() gives it back to the pool instead of closing it.
+    """
+
+    def __init__(self, pool, connection) -> None:
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise pymysql.err.InterfaceError("Connection already returned to the pool")
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+
+class ConnectionPool:
+    """
+    Small thread-safe pool of PyMySQL connections.
+
+    Connections are opened on demand, released ones are kept idle (up to max_idle)
+    and reused by the next get(). A reused connection is only pinged when it was
+    idle for more than ping_after seconds.
+    """
+
+    def __init__(self, settings=None, max_idle=MAX_IDLE, ping_after=PING_AFTER) -> None:
+        self.settings = settings or read_settings()
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        # (connection, release time)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def connect(self):
+        settings = self.settings
+        try:
+            return pymysql.connect(
+                host=settings["host"],
+                user=settings["user"],
+                password=settings["password"],
+                database=settings["database"],
+                port=int(settings["port"]),
+                connect_timeout=CONNECT_TIMEOUT
+            )
+        except pymysql.Error as e:
+            print(f"Database connection not successful to {settings['host']}:{settings['port']}/"
+                  f"{settings['database']} as user {settings['user']}: {e}")
+            raise
+
+    def get(self):
+        while True:
+            with self._lock:
+                connection, released_at = self._idle.pop() if self._idle else (None, None)
+            if connection is None:
+                return PooledConnection(self, self.connect())
+            if time.monotonic() - released_at < self.ping_after:
+                return PooledConnection(self, connection)
+            try:
+                connection.ping(reconnect=True)
+                return PooledConnection(self, connection)
+            except pymysql.Error:
+                self._close(connection)
+
+    def release(self, connection):
+        # uncommitted changes are discarded, as closing the connection would do
+        try:
+            connection.rollback()
+        except pymysql.Error:
+            self._close(connection)
+            return
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((connection, time.monotonic()))
+                return
+        self._close(connection)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except pymysql.Error:
+            pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def get_db_connection():
+    """
+    Returns a connection from the process-wide pool.
+    Calling close() on it gives it back to the pool, connection errors are printed and re-raised.
+    """
+    return get_pool().get()
@@ -0,0 +1,140 @@
+import hashlib
+import os
+
+import db_schema
+import db_table
+
+# Number of rows sent per executemany call. PyMySQL rewrites an executemany on
+# "INSERT ... VALUES (...)" into multi-row VALUES statements, so a batch costs
+# one round trip instead of one per row.
+DEFAULT_BATCH_SIZE = int(os.environ.get("AEROX_INGEST_BATCH_SIZE", "1000"))
+
+
+def build_insert_sql(table, columns):
+    """Returns the parameterized INSERT statement for the given table and columns."""
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+def insert_rows(cursor, table, columns, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Inserts an iterable of row tuples with executemany, batch_size rows at a time.
+    Does not commit, the caller owns the transaction.
+    Returns the number of inserted rows.
+    """
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size: {batch_size}")
+    sql = build_insert_sql(table, columns)
+    inserted = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            cursor.executemany(sql, batch)
+            inserted += len(batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+        inserted += len(batch)
+    return inserted
+
+
+def ingest_rows(connection, table, columns, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Inserts all the rows of one source file in a single transaction.
+    The transaction is rolled back and the error re-raised if any batch fails.
+    """
+    cursor = connection.cursor()
+    try:
+        inserted = insert_rows(cursor, table, columns, rows, batch_size)
+        connection.commit()
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """sha256 of the file content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rows_hash(rows):
+    """sha256 of computed rows (rows that do not come from a file)."""
+    return hashlib.sha256(repr(list(rows)).encode('utf-8')).hexdigest()
+
+
+def replace_source_rows(connection, table, columns, read_rows, run_code, source_file, content_hash,
+                        batch_size=DEFAULT_BATCH_SIZE, replace_legacy=True):
+    """
+    Idempotent load of one source file of a run, in a single transaction:
+    - skipped if the manifest already has this content hash for (run_code, table, source_file)
+    - otherwise the rows previously loaded from this source are deleted and read_rows() is inserted.
+      With replace_legacy, the rows of the run loaded before the manifest existed (no SOURCE_FILE)
+      are deleted too.
+    read_rows is only called when the source has to be loaded.
+    Returns the number of inserted rows, None if the source was unchanged.
+    db_schema.ensure_ingest_schema must have been run for the table.
+    """
+    manifest = db_table.Table_Ingest_manifest
+    source_column = db_schema.SOURCE_COLUMN
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"""SELECT CONTENT_HASH FROM {manifest}
+                           WHERE RUN_CODE = %s AND TABLE_NAME = %s AND SOURCE_FILE = %s FOR UPDATE""",
+                       (run_code, table, source_file))
+        row = cursor.fetchone()
+        if row and row[0] == content_hash:
+            connection.rollback()
+            return None
+
+        legacy = f" OR {source_column} IS NULL" if replace_legacy else ""
+        cursor.execute(f"DELETE FROM {table} WHERE RUN_CODE = %s AND ({source_column} = %s{legacy})",
+                       (run_code, source_file))
+        rows = (values + (source_file,) for values in read_rows())
+        inserted = insert_rows(cursor, table, list(columns) + [source_column], rows, batch_size)
+        cursor.execute(f"""INSERT INTO {manifest} (RUN_CODE, TABLE_NAME, SOURCE_FILE, CONTENT_HASH, ROW_COUNT)
+                           VALUES (%s, %s, %s, %s, %s)
+                           ON DUPLICATE KEY UPDATE CONTENT_HASH = VALUES(CONTENT_HASH), ROW_COUNT = VALUES(ROW_COUNT)""",
+                       (run_code, table, source_file, content_hash, inserted))
+        connection.commit()
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def append_source_rows(connection, table, columns, rows, run_code, source_file, replace=False,
+                       batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Appends rows of a source file still being written, in a single transaction.
+    With replace, the rows previously loaded from this source are deleted first.
+    The manifest entry of the source is dropped: the next replace_source_rows reloads the complete file.
+    Returns the number of inserted rows.
+    """
+    manifest = db_table.Table_Ingest_manifest
+    source_column = db_schema.SOURCE_COLUMN
+    cursor = connection.cursor()
+    try:
+        if replace:
+            cursor.execute(f"DELETE FROM {table} WHERE RUN_CODE = %s AND {source_column} = %s",
+                           (run_code, source_file))
+        rows = (values + (source_file,) for values in rows)
+        inserted = insert_rows(cursor, table, list(columns) + [source_column], rows, batch_size)
+        cursor.execute(f"DELETE FROM {manifest} WHERE RUN_CODE = %s AND TABLE_NAME = %s AND SOURCE_FILE = %s",
+                       (run_code, table, source_file))
+        connection.commit()
+        return inserted
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
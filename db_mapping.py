@@ -0,0 +1,239 @@
+import csv
+import os
+import re
+
+import db_table
+
+# Columns identifying the run, prepended to every staging row
+RUN_COLUMNS = ['RUN_CODE', 'PROJECT_CODE', 'TASK_CODE', 'RUN_NUMBER']
+
+# Rows parsed at a time, the memory used by a file does not depend on its length
+CHUNK_SIZE = int(os.environ.get("AEROX_INGEST_CHUNK_SIZE", "50000"))
+
+
+class CsvMapping:
+    """
+    Describes how a post-processing CSV output is parsed and which staging table receives it.
+
+    file_names:      exact file names handled by this mapping
+    file_pattern:    regular expression matching a family of file names, its named groups
+                     are added to the context of the file (e.g. ANGLE)
+    table:           target table, from db_table
+    columns:         names given to the CSV columns, in file order
+    insert_columns:  CSV columns inserted in the table, in insert order (default: columns)
+    context_columns: extra run columns filled from the job context (e.g. POST_JOB_ID)
+    as_text:         insert values as strings, as the text staging tables expect
+    float_columns:   columns parsed as float64, inserted as numbers when as_text is False
+    """
+
+    def __init__(self, name, file_names, table, columns, insert_columns=None, context_columns=(),
+                 delimiter=',', skiprows=1, usecols=None, as_text=True, float_columns=(), file_pattern=None):
+        self.name = name
+        self.file_names = frozenset(file_names)
+        self.file_pattern = re.compile(file_pattern) if file_pattern else None
+        self.table = table
+        self.columns = list(columns)
+        self.insert_columns = list(insert_columns or columns)
+        self.context_columns = list(context_columns)
+        self.delimiter = delimiter
+        self.skiprows = skiprows
+        self.usecols = usecols
+        self.as_text = as_text
+        self.float_columns = list(float_columns)
+
+    def __repr__(self) -> str:
+        return f"CsvMapping({self.name} -> {self.table})"
+
+    def matches(self, file_name):
+        return file_name in self.file_names or (self.file_pattern is not None
+                                                and self.file_pattern.fullmatch(file_name) is not None)
+
+    def file_context(self, context, file_path):
+        """Context of one file: the run context, its file name and the named groups of file_pattern."""
+        file_name = os.path.basename(file_path)
+        file_context = dict(context, POST_CSV_FILE_NAME=file_name)
+        if self.file_pattern is not None:
+            match = self.file_pattern.fullmatch(file_name)
+            if match:
+                file_context.update(match.groupdict())
+        return file_context
+
+    @property
+    def db_columns(self):
+        return RUN_COLUMNS + self.context_columns + self.insert_columns
+
+    @property
+    def dtypes(self):
+        """read_csv dtype argument, keyed by column position."""
+        positions = self.usecols or range(len(self.columns))
+        return {position: 'float64' for position, column in zip(positions, self.columns)
+                if column in self.float_columns} or None
+
+    def read_rows(self, file_path, context, skiprows=None, chunksize=CHUNK_SIZE):
+        """
+        Parses the file chunksize rows at a time and yields one tuple per row, ordered as db_columns.
+        file_path can also be a text buffer, skiprows overrides the number of header rows
+        (e.g. 0 for the continuation of a file).
+        context provides the RUN_COLUMNS and context_columns values.
+        """
+        # pandas is imported on first use, it is slow to import
+        import pandas as pd
+
+        prefix = tuple(context.get(column) for column in RUN_COLUMNS + self.context_columns)
+        with pd.read_csv(file_path, delimiter=self.delimiter,
+                         skiprows=self.skiprows if skiprows is None else skiprows,
+                         usecols=self.usecols, header=None, dtype=self.dtypes,
+                         chunksize=chunksize) as reader:
+            for df in reader:
+                df.columns = self.columns
+                yield from self._chunk_rows(df[self.insert_columns], prefix)
+
+    def _chunk_rows(self, df, prefix):
+        if self.as_text:
+            return (prefix + tuple(str(value) for value in values)
+                    for values in df.itertuples(index=False, name=None))
+        # one native Python list per column, NaN inserted as NULL
+        columns = []
+        for column in self.insert_columns:
+            values = df[column].tolist()
+            if df[column].hasnans:
+                values = [None if value != value else value for value in values]
+            columns.append(values)
+        return (prefix + values for values in zip(*columns))
+
+
+# Probe distance in a header cell, e.g. "Line Probe 1500mm: Pressure (Pa)"
+PROBE_DISTANCE = re.compile(r"(\d+(?:\.\d+)?)\s*mm", re.IGNORECASE)
+
+
+class ProbeCsvMapping(CsvMapping):
+    """
+    CSV output with one group of value columns per line probe (e.g. direction, pressure),
+    stored in long format: one (SAMPLE_INDEX, PROBE_mm, values...) row per sample and probe.
+
+    The probe distances are read from the header, default_probes is used when the header
+    does not give them. A new probe does not need a schema change.
+    """
+
+    def __init__(self, name, file_names, table, value_columns, default_probes=(), delimiter=',', skiprows=1):
+        super().__init__(name, file_names, table, value_columns,
+                         insert_columns=['SAMPLE_INDEX', 'PROBE_mm'] + list(value_columns),
+                         delimiter=delimiter, skiprows=skiprows, as_text=False,
+                         float_columns=['PROBE_mm'] + list(value_columns))
+        self.value_columns = list(value_columns)
+        self.default_probes = [float(probe) for probe in default_probes]
+
+    def probe_distances(self, header, probe_count):
+        """Returns the distance of each probe, from the first header cell of its column group."""
+        distances = []
+        for cell in header[::len(self.value_columns)]:
+            match = PROBE_DISTANCE.search(cell)
+            distances.append(float(match.group(1)) if match else None)
+        if len(distances) == probe_count and None not in distances:
+            return distances
+        if len(self.default_probes) == probe_count:
+            return self.default_probes
+        raise ValueError(f"Cannot read the distances of the {probe_count} probes from the header {header}")
+
+    def read_rows(self, file_path, context, skiprows=None, chunksize=CHUNK_SIZE):
+        """Yields one tuple per sample and probe, ordered as db_columns. Rows are built with NumPy per chunk."""
+        if isinstance(file_path, (str, os.PathLike)):
+            with open(file_path, newline='') as file:
+                yield from self.read_rows(file, context, skiprows, chunksize)
+            return
+        import numpy as np
+        import pandas as pd
+
+        skiprows = self.skiprows if skiprows is None else skiprows
+        # the first header row names the probes, the other ones are skipped
+        header = []
+        for row_number in range(skiprows):
+            line = file_path.readline()
+            if row_number == 0:
+                header = next(csv.reader([line], delimiter=self.delimiter), [])
+        prefix = tuple(context.get(column) for column in RUN_COLUMNS + self.context_columns)
+        group = len(self.value_columns)
+        probes = None
+        first_sample = 0
+        with pd.read_csv(file_path, delimiter=self.delimiter, header=None, dtype='float64',
+                         chunksize=chunksize) as reader:
+            for df in reader:
+                values = df.to_numpy()
+                samples, width = values.shape
+                if width % group:
+                    raise ValueError(f"{width} columns is not a multiple of {group} values per probe")
+                probe_count = width // group
+                if probes is None:
+                    probes = np.array(self.probe_distances(header, probe_count))
+                # (sample, probe, value) -> one row per sample and probe
+                values = values.reshape(samples * probe_count, group)
+                columns = [np.repeat(np.arange(first_sample, first_sample + samples), probe_count).tolist(),
+                           np.tile(probes, samples).tolist()]
+                columns.extend(_float_list(values[:, i]) for i in range(group))
+                first_sample += samples
+                yield from (prefix + row for row in zip(*columns))
+
+
+def _float_list(array):
+    """Native Python floats, NaN as None (NULL)."""
+    import numpy as np
+
+    values = array.tolist()
+    if np.isnan(array).any():
+        values = [None if value != value else value for value in values]
+    return values
+
+
+HEAD_PRESSURE_PULSE_PROBES_mm = [1500, 1800, 2100, 2400, 2700, 3000, 3300]
+
+# Ordered registry of the CSV outputs loaded in the database.
+# A new post-processing output only needs a new entry here.
+REGISTRY = [
+    CsvMapping('mesh statistics', ['meshStatistics.csv'], db_table.Staging_Mesh,
+               ['MONITORS', 'RESULTS'], delimiter=';'),
+    CsvMapping('RTM simulation metrics', ['simulationMetrics.csv'], db_table.Staging_Table_Ext_Aero,
+               ['MONITORS', 'RESULTS'], context_columns=['POST_JOB_ID'], delimiter=';'),
+    CsvMapping('CFx', ['Cx.csv'], db_table.Staging_Aero_CFx,
+               ['ITERATION', 'CFx_Monitor'], as_text=False, float_columns=['CFx_Monitor']),
+    CsvMapping('CFz', ['CFz.csv'], db_table.Staging_Aero_CFz,
+               ['ITERATION', 'CFz_Monitor'], usecols=[0, 1], as_text=False, float_columns=['CFz_Monitor']),
+    # simulationMetrics<angle>.csv of the crosswind sweeps, whatever the angle step
+    CsvMapping('XWD simulation metrics', [], db_table.Staging_Table_Ext_Aero,
+               ['MONITORS', 'RESULTS'], context_columns=['ANGLE'], delimiter=';',
+               file_pattern=r'simulationMetrics(?P<ANGLE>\d+)\.csv'),
+    CsvMapping('cumulated forces',
+               ['0-Cumulated_Fx_iter.csv', '1-Cumulated_Fx_iter_bottom.csv', '1-Cumulated_Fx_iter_top.csv',
+                '2-Cumulated_Fx_iter_pressure.csv', '2-Cumulated_Fx_iter_shear.csv'],
+               db_table.Staging_Table_Cummulative,
+               ['POSITION_m', 'FORCE_N', 'ACCUMULATED_FORCE_N', 'PROFILE_LOWER_m', 'PROFILE_UPPER_m'],
+               context_columns=['POST_CSV_FILE_NAME'], as_text=False,
+               float_columns=['POSITION_m', 'FORCE_N', 'ACCUMULATED_FORCE_N', 'PROFILE_LOWER_m', 'PROFILE_UPPER_m']),
+    CsvMapping('residuals', ['residuals.csv'], db_table.Staging_Table_Residuals,
+               ['ITERATION', 'Tdr_RESIDUAL', 'Tke_RESIDUAL', 'CONTINUITY', 'X_MOMENTUM', 'Y_MOMENTUM', 'Z_MOMENTUM'],
+               insert_columns=['ITERATION', 'CONTINUITY', 'X_MOMENTUM', 'Y_MOMENTUM', 'Z_MOMENTUM', 'Tke_RESIDUAL', 'Tdr_RESIDUAL'],
+               as_text=False,
+               float_columns=['Tdr_RESIDUAL', 'Tke_RESIDUAL', 'CONTINUITY', 'X_MOMENTUM', 'Y_MOMENTUM', 'Z_MOMENTUM']),
+    ProbeCsvMapping('head pressure pulse', ['head_pressure_pulse.csv'], db_table.Staging_Table_head_Pr_pulse_probe,
+                    ['DIRECTION', 'PRESSURE'], default_probes=HEAD_PRESSURE_PULSE_PROBES_mm),
+]
+
+
+def find_mapping(file_name, registry=REGISTRY):
+    """Returns the first mapping handling this file name, None otherwise."""
+    for mapping in registry:
+        if mapping.matches(file_name):
+            return mapping
+    return None
+
+
+def find_registered_files(index, registry=REGISTRY):
+    """
+    Returns the (mapping, file_path) pairs of every registered file of a JobFolderIndex,
+    ordered as the registry.
+    """
+    found = {id(mapping): [] for mapping in registry}
+    for entry in index.files():
+        mapping = find_mapping(entry.name, registry)
+        if mapping is not None:
+            found[id(mapping)].append(entry.path)
+    return [(mapping, file_path) for mapping in registry for file_path in found[id(mapping)]]
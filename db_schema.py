@@ -0,0 +1,124 @@
+import pymysql
+
+import db_table
+
+# Tables owned by the workflow itself, created on first use.
+# DDL statements commit the current transaction in MySQL: ensure_schema
+# must run before a transaction is started.
+
+# Last run number allocated per project, run numbers are numbered per project
+# (the task code is only part of the name)
+RUN_NUMBER_COUNTER = f"""
+    CREATE TABLE IF NOT EXISTS {db_table.Table_Run_number_counter} (
+        PROJECT_CODE VARCHAR(64) NOT NULL,
+        LAST_NUMBER INT UNSIGNED NOT NULL,
+        PRIMARY KEY (PROJECT_CODE)
+    ) ENGINE=InnoDB
+"""
+
+# Source files already loaded in the staging tables, with the hash of their content
+INGEST_MANIFEST = f"""
+    CREATE TABLE IF NOT EXISTS {db_table.Table_Ingest_manifest} (
+        RUN_CODE VARCHAR(64) NOT NULL,
+        TABLE_NAME VARCHAR(64) NOT NULL,
+        SOURCE_FILE VARCHAR(255) NOT NULL,
+        CONTENT_HASH CHAR(64) NOT NULL,
+        ROW_COUNT INT UNSIGNED NOT NULL,
+        LOADED_AT TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (RUN_CODE, TABLE_NAME, SOURCE_FILE)
+    ) ENGINE=InnoDB
+"""
+
+# Head pressure pulse in long format, one row per sample and line probe:
+# a new probe does not need a schema change
+HEAD_PRESSURE_PULSE_PROBE = f"""
+    CREATE TABLE IF NOT EXISTS {db_table.Staging_Table_head_Pr_pulse_probe} (
+        RUN_CODE VARCHAR(64) NOT NULL,
+        PROJECT_CODE VARCHAR(64) NULL,
+        TASK_CODE VARCHAR(64) NULL,
+        RUN_NUMBER VARCHAR(16) NULL,
+        SAMPLE_INDEX INT UNSIGNED NOT NULL,
+        PROBE_mm DOUBLE NOT NULL,
+        DIRECTION DOUBLE NULL,
+        PRESSURE DOUBLE NULL,
+        SOURCE_FILE VARCHAR(255) NULL,
+        KEY idx_head_pr_pulse_probe_run (RUN_CODE, PROBE_mm)
+    ) ENGINE=InnoDB
+"""
+
+SCHEMA = [RUN_NUMBER_COUNTER]
+
+# Staging tables created by the workflow, set up with the ingestion manifest
+STAGING_TABLES = [HEAD_PRESSURE_PULSE_PROBE]
+
+# Column added to the staging tables, identifies the source file of each row
+SOURCE_COLUMN = "SOURCE_FILE"
+
+# Columns added to existing staging tables: (table, column, definition)
+# Crosswind angle of the simulationMetrics<angle>.csv files
+EXT_AERO_ANGLE_COLUMN = (db_table.Staging_Table_Ext_Aero, "ANGLE", "INT NULL")
+
+STAGING_COLUMNS = [EXT_AERO_ANGLE_COLUMN]
+
+# Indexes added to the existing tables: (table, index name, columns)
+# Auto_Run_Num lookups of the previous runs with the same job description
+AUTO_RUN_NUM_DESCRIPTION_INDEX = (db_table.Table_Auto_run_number, "idx_auto_run_num_description",
+                                  "PROJECT_CODE, TASK_CODE, JOB_DESCRIPTION(64)")
+
+INDEXES = [AUTO_RUN_NUM_DESCRIPTION_INDEX]
+
+# DDL already run by this process
+_applied = set()
+
+
+def ensure_schema(cursor, statements=None, indexes=None):
+    """Runs the CREATE ... IF NOT EXISTS statements and creates the indexes not handled yet by this process."""
+    for statement in SCHEMA if statements is None else statements:
+        if statement in _applied:
+            continue
+        cursor.execute(statement)
+        _applied.add(statement)
+    for index in INDEXES if indexes is None else indexes:
+        if index in _applied:
+            continue
+        ensure_index(cursor, *index)
+        _applied.add(index)
+
+
+def ensure_ingest_schema(cursor, tables):
+    """
+    Creates the ingestion manifest and the workflow staging tables, adds the STAGING_COLUMNS
+    and the SOURCE_FILE column, indexed with RUN_CODE, to the staging tables.
+    """
+    ensure_schema(cursor, [INGEST_MANIFEST] + STAGING_TABLES, [])
+    for table, column, definition in STAGING_COLUMNS:
+        if table not in tables or (column, table) in _applied:
+            continue
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}")
+        _applied.add((column, table))
+    for table in tables:
+        key = (SOURCE_COLUMN, table)
+        if key in _applied:
+            continue
+        # MariaDB syntax, the column is nullable: rows loaded before the manifest have no source
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {SOURCE_COLUMN} VARCHAR(255) NULL")
+        ensure_index(cursor, table, f"idx_{table.lower()}_source", f"RUN_CODE, {SOURCE_COLUMN}")
+        _applied.add(key)
+
+
+def ensure_index(cursor, table, name, columns):
+    """
+    Creates the index if the table does not have it yet.
+    A failure is only reported: the queries stay correct without the index, only slower.
+    """
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, name))
+    row = cursor.fetchone()
+    if row and row[0]:
+        return
+    try:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    except pymysql.MySQLError as e:
+        print(f"Cannot create index {name} on {table}: {e}")
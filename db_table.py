@@ -4,9 +4,13 @@ Staging_Table_Ext_Aero = 'Ext_Aero_Simulation_Metrics'
 Staging_Table_Cummulative = 'Ext_Aero_Cumulated'
 Staging_Table_Residuals = 'Ext_Aero_Residuals'
 Staging_Table_head_Pr_pulse = 'Ext_Aero_Head_Pr_Pulse'
+Staging_Table_head_Pr_pulse_probe = 'Ext_Aero_Head_Pr_Pulse_Probe'
 Staging_Parameters = 'Db_Parameters'
 Table_Flag = 'Db_Tags'
 Staging_Aero_CFx = 'Ext_Aero_CFx'
 Staging_Aero_CFz = 'Ext_Aero_CFz'
 tab_usr = 'Db_user_name'
-table_elapse = 'Db_Elapse_Time'
\ No newline at end of file
+table_elapse = 'Db_Elapse_Time'
+Table_Auto_run_number = 'Auto_Run_Num'
+Table_Run_number_counter = 'Auto_Run_Num_Counter'
+Table_Ingest_manifest = 'Db_Ingest_Manifest'
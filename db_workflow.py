@@ -1,35 +1,99 @@
 import sys # Import sys to access command-line arguments
-import subprocess # Added for running external commands
 import pymysql
 import os
-import pandas as pd
+import re
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 
-from datetime import datetime # Added for handling timestamps
+import db_connection
 from db_connection import get_db_connection
+from job_folder_index import JobFolderIndex
 from select_dir import base_directory
+import accounting
+import db_ingest
+import db_mapping
+import db_schema
 import db_table
+import parquet_archive
+
+# Staging tables loaded by process_job_data
+INGEST_TABLES = list(dict.fromkeys([mapping.table for mapping in db_mapping.REGISTRY] +
+                                   [db_table.Staging_Parameters, db_table.Table_Flag, db_table.table_elapse]))
+ELAPSE_COLUMNS = ['RUN_CODE', 'PROJECT_CODE', 'TASK_CODE', 'RUN_NUMBER', 'SUBMISSION_DATE', 'USER_NAME',
+                  'PRE_JOB_ID', 'PRE_ELAPSED_TIME', 'RUN_JOB_ID', 'RUN_ELAPSED_TIME', 'POST_JOB_ID', 'POST_ELAPSED_TIME']
+PARAMETERS_COLUMNS = ['RUN_CODE', 'PROJECT_CODE', 'TASK_CODE', 'RUN_NUMBER', 'JOB_DESCRIPTION', 'SOLVER_VERSION',
+                      'QUEUE_TYPE', 'WORKFLOW_STEPS', 'TEMPLATE']
+TAG_COLUMNS = ['RUN_CODE', 'PROJECT_CODE', 'TASK_CODE', 'RUN_NUMBER', 'PRE_TAG', 'RUN_TAG', 'POST_TAG']
+
+# Multi-folder ingestion: job folders parsed in parallel processes, written by a bounded number of
+# threads, each with its own pooled connection
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+DEFAULT_WRITERS = db_connection.MAX_IDLE
+# A job folder is a run folder <PROJECT>/<RUN_CODE>: it holds the .JOB_STEPS file of its submissions
+# or PRE/RUN/POST step folders (-FAILED, -ABORTED... included), each with its own parameters.txt
+JOB_FOLDER_MARKER = '.JOB_STEPS'
+STEP_FOLDER_PATTERN = re.compile(r'(PRE|RUN|POST)(-.*)?')
+
+
+class IngestError(Exception):
+    """Raised when a job folder cannot be ingested at all."""
+
+
+class JobData:
+    """
+    Everything process_job_data reads from a job folder, ready to be written in the database.
+    Built by scan_job_folder without any database access, so it can be built in a worker process.
+    """
+
+    def __init__(self, base_dir, workflow_step) -> None:
+        self.base_dir = base_dir
+        self.workflow_step = workflow_step
+        # RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, POST_JOB_ID
+        self.context = {}
+        self.elapse_row = None
+        # (mapping, file_path, source_file, file_context, content_hash), the rows are read at write time
+        self.files = []
+        self.parameters_row = None
+        self.tag_row = None
+        self.tag_source = None
+        # filled by write_job_data
+        self.inserted = 0
+        self.unchanged = 0
+        self.errors = []
+
+    def __repr__(self) -> str:
+        return f"JobData({self.base_dir})"
+
+    @property
+    def run_code(self):
+        return self.context.get('RUN_CODE')
+
+    def summary(self):
+        text = f"{self.inserted} rows inserted, {self.unchanged} sources unchanged"
+        if self.errors:
+            text += f", {len(self.errors)} error(s): " + "; ".join(self.errors)
+        return text
 
 # --- NEW FUNCTION to read WORKFLOW_STEPS from parameters.txt ---
-def get_workflow_step_from_params(base_dir, target_file='parameters.txt'):
+def get_workflow_step_from_params(index, target_file='parameters.txt'):
     """Reads the WORKFLOW_STEPS value from the parameters.txt file."""
-    for root, dirs, files in os.walk(base_dir):
-        if target_file in files:
-            file_path = os.path.join(root, target_file)
-            try:
-                with open(file_path, 'r') as file:
-                    for line in file:
-                        if line.strip().startswith("WORKFLOW_STEPS"):
-                            return line.strip().split(":", 1)[-1].strip()
-            except Exception as e:
-                print(f"Error reading the file {file_path}: {e}")
+    for file_path in index.find(target_file):
+        try:
+            with open(file_path, 'r') as file:
+                for line in file:
+                    if line.strip().startswith("WORKFLOW_STEPS"):
+                        return line.strip().split(":", 1)[-1].strip()
+        except Exception as e:
+            print(f"Error reading the file {file_path}: {e}")
     return None
 
-# --- NEW Elapse Time Insertion Function ---
-def insert_elapse_time(runcode, projectcode, taskcode, runnum, workflowstep,
-                       submissiondate, username, prejobid, preelapsetime,
-                       runjobid, runelapsetime, postjobid, postelapsetime, connection):
+# --- NEW Elapse Time Row Function ---
+def elapse_time_row(runcode, projectcode, taskcode, runnum, workflowstep,
+                    submissiondate, username, prejobid, preelapsetime,
+                    runjobid, runelapsetime, postjobid, postelapsetime):
     """
-    Inserts a new row in Db_Elapse_Time for the current job run/step.
+    Returns the Db_Elapse_Time row of the current job run/step, ordered as ELAPSE_COLUMNS.
     Only fills the columns relevant to the step specified (PRE, RUN, POST, ALL).
     """
     # Set all fields to None (NULL)
@@ -60,83 +124,109 @@ def insert_elapse_time(runcode, projectcode, taskcode, runnum, workflowstep,
         values['POSTJOBID'] = postjobid
         values['POSTELAPSEDTIME'] = postelapsetime
 
-    # Always insert as a new row, never overwrite
-    sql = f"""
-        INSERT INTO {db_table.table_elapse}
-        (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, SUBMISSION_DATE, USER_NAME, 
-         PRE_JOB_ID, PRE_ELAPSED_TIME, RUN_JOB_ID, RUN_ELAPSED_TIME, POST_JOB_ID, POST_ELAPSED_TIME)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    return (values['RUNCODE'], values['PROJECTCODE'], values['TASKCODE'], values['RUNNUMBER'],
+            values['SUBMISSIONDATE'], values['USERNAME'], values['PREJOBID'], values['PREELAPSEDTIME'],
+            values['RUNJOBID'], values['RUNELAPSEDTIME'], values['POSTJOBID'], values['POSTELAPSEDTIME'])
+
+def replace_computed_row(connection, table, columns, values, run_code, source):
     """
-    params = (values['RUNCODE'], values['PROJECTCODE'], values['TASKCODE'], values['RUNNUMBER'],
-              values['SUBMISSIONDATE'], values['USERNAME'], values['PREJOBID'], values['PREELAPSEDTIME'],
-              values['RUNJOBID'], values['RUNELAPSEDTIME'], values['POSTJOBID'], values['POSTELAPSEDTIME'])
-    
-    # Use a new cursor within the function for encapsulation
-    cursor = connection.cursor()
-    cursor.execute(sql, params)
-    connection.commit()
-    cursor.close()
+    Idempotent load of a row computed from the job folder, keyed by its source name.
+    Rows loaded before the ingestion manifest are kept, the same source may not have produced them.
+    """
+    return db_ingest.replace_source_rows(connection, table, columns, lambda: [values], run_code, source,
+                                         db_ingest.rows_hash([values]), replace_legacy=False)
 
-def process_job_data(job_folder_path):
-    connection = None # Initialize connection to None
+
+def scan_registered_files(index, context):
+    """
+    Returns the JobData.files entries of every file of db_mapping.REGISTRY found in the job folder index.
+    Only the files are hashed here, their rows are streamed in batches when they are written.
+    Files that cannot be read are reported as errors.
+    """
+    run_code = context.get('RUN_CODE')
+    files, errors = [], []
+    for mapping, file_path in db_mapping.find_registered_files(index):
+        try:
+            file_context = mapping.file_context(context, file_path)
+            # no key for the manifest without a run code, plain insert
+            content_hash = db_ingest.file_hash(file_path) if run_code else None
+            files.append((mapping, file_path, os.path.relpath(file_path, index.base_dir), file_context,
+                          content_hash))
+        except Exception as e:
+            print(f"Error processing {mapping.name} file {file_path}: {e}")
+            errors.append(f"{file_path}: {e}")
+    return files, errors
+
+def write_registered_files(connection, data, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+    """
+    Loads the registered files of a JobData, one transaction per file.
+    Files already loaded with the same content are skipped, changed files replace their previous rows.
+    """
+    for mapping, file_path, source_file, file_context, content_hash in data.files:
+        try:
+            print(f"Processing {mapping.name} file: {file_path}")
+            read_rows = lambda: mapping.read_rows(file_path, file_context)
+            if content_hash is None:
+                inserted = db_ingest.ingest_rows(connection, mapping.table, mapping.db_columns, read_rows(),
+                                                 batch_size)
+            else:
+                inserted = db_ingest.replace_source_rows(
+                    connection, mapping.table, mapping.db_columns, read_rows,
+                    data.run_code, source_file, content_hash, batch_size)
+            if inserted is None:
+                print(f"{file_path} unchanged since its last ingestion, skipped")
+                data.unchanged += 1
+            else:
+                print(f"{inserted} rows inserted from {file_path}")
+                data.inserted += inserted
+        except Exception as e:
+            print(f"Error processing {mapping.name} file {file_path}: {e}")
+            data.errors.append(f"{file_path}: {e}")
+
+def prepare_ingest_tables(connection):
+    """
+    DDL commits: the manifest and SOURCE_FILE columns are set up before any ingestion transaction.
+    Raises IngestError if the tables cannot be prepared.
+    """
+    cursor = connection.cursor()
     try:
-        connection = get_db_connection()
-        print("Connected Successfully to MARIADB")
+        db_schema.ensure_ingest_schema(cursor, INGEST_TABLES)
     except Exception as e:
-        print(f"Connection not successful: {e}")
-        sys.exit(1) # Exit if DB connection fails
+        raise IngestError(f"Cannot prepare the ingestion tables: {e}") from e
+    finally:
+        cursor.close()
 
+def scan_job_folder(job_folder_path):
+    """
+    Reads everything process_job_data loads from a job folder: run code, qacct records, registered files,
+    parameters and tags. No database access, the result is written by write_job_data.
+    Side effect: the numeric registered files are written to the Parquet archive
+    (parquet_archive.archive_registered_files) during the scan.
+    Raises IngestError if the folder cannot be ingested.
+    """
     try:
         base_dir = base_directory(job_folder_path) # Pass the job_folder_path
         print(f"Processing data from base directory: {base_dir}")
     except ValueError as e:
-        print(f"Error getting base directory: {e}")
-        if connection:
-            connection.close()
-        sys.exit(1)
+        raise IngestError(f"Error getting base directory: {e}") from e
+
+    # Single scan of the job folder, every file lookup below is answered from it
+    folder_index = JobFolderIndex(base_dir)
 
     # --- Get the current workflow step ---
-    workflow_step = get_workflow_step_from_params(base_dir)
+    workflow_step = get_workflow_step_from_params(folder_index)
     if not workflow_step:
-        print("Could not determine WORKFLOW_STEPS from parameters.txt. Aborting data processing.")
-        if connection:
-            connection.close()
-        sys.exit(1)
+        raise IngestError("Could not determine WORKFLOW_STEPS from parameters.txt. Aborting data processing.")
     print(f"Current WORKFLOW_STEP: {workflow_step}")
-
-
-    cursor = connection.cursor() # Initialize cursor after connection is established
-
-    #IF THE SIMULATION IS COMPLETED & IF PRE, RUN, POST FOLDERS ARE CREATED
-    pre_meshStatics = 'meshStatistics.csv' # Mention the csv file name as it is in the folder path
-    post_simulationMetrics = 'simulationMetrics.csv'
-    post_CFx = 'Cx.csv'
-    post_CFz = 'CFz.csv' # Corrected from CFz to Cz for consistency with common usage
-    post_simulationMetrics_XWD = [f'simulationMetrics{str(i)}.csv' for i in range(0, 200, 5)]
-    post_cummulative = ['0-Cumulated_Fx_iter.csv', '1-Cumulated_Fx_iter_bottom.csv', '1-Cumulated_Fx_iter_top.csv', '2-Cumulated_Fx_iter_pressure.csv', '2-Cumulated_Fx_iter_shear.csv']
-    post_residuals = 'residuals.csv'
-    post_head_Pr_pulse = 'head_pressure_pulse.csv'
+    data = JobData(base_dir, workflow_step)
 
     # KNOWN FILE AND FOLDER
     possible_tags = ['ABORT', 'TERMINATED', 'FAILED', 'FINISHED']
     pre_folders = ['PRE', 'PRE-FAILED', 'PRE-ABORTED']
     run_folders = ['RUN', 'RUN-FAILED', 'RUN-ABORTED']
     post_folders = ['POST', 'POST-FAILED', 'POST-ABORTED']
-
     # Read the .csv files located in the Root directory and say its count
-    def find_csv_files(base_dir, file_identifier = '.csv'):
-        list_of_found_files = []
-
-        for root, dirs, files in os.walk(base_dir):
-            for current_file in files:
-                if isinstance(file_identifier, tuple): # Handle tuple of identifiers (e.g., for cumulated files)
-                    if current_file in file_identifier:
-                        list_of_found_files.append(os.path.join(root, current_file))
-                elif isinstance(file_identifier, str) and current_file.endswith(file_identifier): # Handle single extension or full filename
-                    list_of_found_files.append(os.path.join(root, current_file))
-        return list_of_found_files
-
-    csv_files_with_path = find_csv_files(base_dir) # This function holds the location the csv files from where you can extract the column name.
+    csv_files_with_path = folder_index.find_suffix('.csv') # This function holds the location the csv files from where you can extract the column name.
     if csv_files_with_path:
         print(f'Total Count of CSV Files: {len(csv_files_with_path)}')
     else:
@@ -186,43 +276,21 @@ def process_job_data(job_folder_path):
         print("Could not extract a valid RUN_CODE from folder structure. Skipping detailed data insertion for this job.")
         # We will not exit, but continue to try to insert flags if possible
     
-    # Read and insert Mesh Statics CSV File and Insert the Values into DB
-    mesh_files = find_csv_files(base_dir, pre_meshStatics)
-
-    for file_path in mesh_files:
-        try:
-            print(f"Processing mesh file: {file_path}")
-            df = pd.read_csv(file_path, delimiter=';', skiprows=1, header=None)
-            df.columns = ['MONITORS', 'RESULTS']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Mesh}
-                              (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, MONITORS, RESULTS)
-                             VALUES (%s, %s, %s, %s, %s, %s)""",
-                             (run_code, project_code, task_code, run_num, str(row['MONITORS']), str(row['RESULTS'])))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing mesh file {file_path}: {e}")
-            connection.rollback() # Rollback in case of an error during a batch of inserts
     # Search for the file name starting with 'StarccmFlex' in the 'PRE', 'RUN', 'POST' folder:
-    def find_WF_in_subfolders(base_dir, prefix = 'StarccmFlex'):
+    def find_WF_in_subfolders(index, prefix = 'StarccmFlex'):
         WF_list = {}
-        for subfolder in os.listdir(base_dir):
-            subfolder_path = os.path.join(base_dir, subfolder)
-            if os.path.isdir(subfolder_path):
-                for file in os.listdir(subfolder_path):
-                    if file.startswith(prefix) and file.endswith('.log'):
-                        WF_list[subfolder] = file
-                        break
+        for subfolder in index.step_folders():
+            for entry in index.step_entries(subfolder):
+                if entry.name.startswith(prefix) and entry.name.endswith('.log'):
+                    WF_list[subfolder] = entry.name
+                    break
         return WF_list
         
-    WF_list = find_WF_in_subfolders(base_dir)
+    WF_list = find_WF_in_subfolders(folder_index)
     print("The log files found are", WF_list)
 
     # Initialize the values 
     POST_JOB_ID = RUN_JOB_ID = PRE_JOB_ID = None
-    pre_owner = run_owner = post_owner = None
-    pre_qsub_dt = run_qsub_dt = post_qsub_dt = None
-    pre_elapse_time = run_elapse_time = post_elapse_time = None
 
     # FOLDER TYPE for PRE:
     for key in pre_folders:
@@ -246,108 +314,26 @@ def process_job_data(job_folder_path):
     print('Found job_ID for Run is:', RUN_JOB_ID)
     print('Found job_ID for Post is:', POST_JOB_ID)
 
-    # Get the PRE INFO FROM LINUX MACHINE
-     # Get the PRE INFO FROM LINUX MACHINE
-    try:
-        if PRE_JOB_ID is not None:
-            pre_linux_info = subprocess.run(['qacct', '-j', str(PRE_JOB_ID)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            usr_name = pre_linux_info.stdout.decode('utf-8')
-            lines = usr_name.splitlines()
-            if len(lines) >= 15:
-                part5 = lines[4].split()
-                qt = lines[12].split()
-                st = lines[13].split()
-                et = lines[14].split()
-                pre_owner = part5[1]
-                qsub_ent = qt[3], qt[2], qt[5], qt[4]
-                pre_qsub_datetime = ' '.join(qsub_ent)
-                pre_qsub_dt = datetime.strptime(pre_qsub_datetime, '%d %b %Y %H:%M:%S')
-
-                sim_st = st[3], st[2], st[5], st[4]
-                pre_sim_start_time = ' '.join(sim_st)
-                pre_start_dt = datetime.strptime(pre_sim_start_time, '%d %b %Y %H:%M:%S')
-
-                sim_end = et[3], et[2], et[5], et[4]
-                pre_sim_end_time = ' '.join(sim_end)
-                pre_end_dt = datetime.strptime(pre_sim_end_time, '%d %b %Y %H:%M:%S')
-
-                pre_elapse_time = pre_end_dt-pre_start_dt
-
-                print("PRE Owner:", pre_owner)
-                print("PRE Qsub Time:", pre_qsub_dt)
-                print("PRE Elapse Time:", pre_elapse_time)
-        else:
-            print("PRE_JOB_ID is None. Skipping PRE job info extraction.")      
-    except Exception as e:
-        print(f"Error reading the PRE job info: {e}")
-
-    # Get the RUN INFO FROM LINUX MACHINE
-    try:
-        if RUN_JOB_ID is not None:
-            run_linux_info = subprocess.run(['qacct', '-j', str(RUN_JOB_ID)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            usr_name = run_linux_info.stdout.decode('utf-8')
-            lines = usr_name.splitlines()
-            if len(lines) >= 15:
-                part5 = lines[4].split()
-                qt = lines[12].split()
-                st = lines[13].split()
-                et = lines[14].split()
-                run_owner = part5[1]
-                qsub_ent = qt[3], qt[2], qt[5], qt[4]
-                run_qsub_datetime = ' '.join(qsub_ent)
-                run_qsub_dt = datetime.strptime(run_qsub_datetime, '%d %b %Y %H:%M:%S')
-
-                sim_st = st[3], st[2], st[5], st[4]
-                run_sim_start_time = ' '.join(sim_st)
-                run_start_dt = datetime.strptime(run_sim_start_time, '%d %b %Y %H:%M:%S')
-
-                sim_end = et[3], et[2], et[5], et[4]
-                run_sim_end_time = ' '.join(sim_end)
-                run_end_dt = datetime.strptime(run_sim_end_time, '%d %b %Y %H:%M:%S')
-
-                run_elapse_time = run_end_dt-run_start_dt
-
-                print("RUN Owner:", run_owner)
-                print("RUN Qsub Time:", run_qsub_dt)
-                print("RUN Elapse Time:", run_elapse_time)
-        else:
-            print("RUN_JOB_ID is None. Skipping RUN job info extraction.")  
-    except Exception as e:
-        print(f"Error reading the RUN job info: {e}")
-
-    # Get the POST INFO FROM LINUX MACHINE
-    try:
-        if POST_JOB_ID is not None:
-            post_linux_info = subprocess.run(['qacct', '-j', str(POST_JOB_ID)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            usr_name = post_linux_info.stdout.decode('utf-8')
-            lines = usr_name.splitlines()
-            if len(lines) >= 15:
-                part5 = lines[4].split()
-                qt = lines[12].split()
-                st = lines[13].split()
-                et = lines[14].split()
-                post_owner = part5[1]
-                qsub_ent = qt[3], qt[2], qt[5], qt[4]
-                post_qsub_datetime = ' '.join(qsub_ent)
-                post_qsub_dt = datetime.strptime(post_qsub_datetime, '%d %b %Y %H:%M:%S')
-
-                sim_st = st[3], st[2], st[5], st[4]
-                post_sim_start_time = ' '.join(sim_st)
-                post_start_dt = datetime.strptime(post_sim_start_time, '%d %b %Y %H:%M:%S')
-
-                sim_end = et[3], et[2], et[5], et[4]
-                post_sim_end_time = ' '.join(sim_end)
-                post_end_dt = datetime.strptime(post_sim_end_time, '%d %b %Y %H:%M:%S')
-
-                post_elapse_time = post_end_dt-post_start_dt
-
-                print("POST Owner:", post_owner)
-                print("POST Qsub Time:", post_qsub_dt)
-                print("POST Elapse Time:", post_elapse_time)
-        else:
-            print("POST_JOB_ID is None. Skipping POST job info extraction.")  
-    except Exception as e:
-        print(f"Error reading the POST job info: {e}")
+    # Get the PRE, RUN and POST INFO FROM LINUX MACHINE (concurrent qacct lookups)
+    records = accounting.lookup_many([PRE_JOB_ID, RUN_JOB_ID, POST_JOB_ID])
+    for step, job_id in (('PRE', PRE_JOB_ID), ('RUN', RUN_JOB_ID), ('POST', POST_JOB_ID)):
+        if job_id is None:
+            print(f"{step}_JOB_ID is None. Skipping {step} job info extraction.")
+            continue
+        record = records.get(str(job_id))
+        if record is None:
+            continue
+        print(f"{step} Owner:", record.owner)
+        print(f"{step} Qsub Time:", record.qsub_time)
+        print(f"{step} Elapse Time:", record.elapsed_time)
+
+    def record_value(job_id, attribute):
+        record = records.get(str(job_id)) if job_id is not None else None
+        return getattr(record, attribute) if record else None
+
+    pre_owner, run_owner, post_owner = (record_value(job_id, 'owner') for job_id in (PRE_JOB_ID, RUN_JOB_ID, POST_JOB_ID))
+    pre_qsub_dt, run_qsub_dt, post_qsub_dt = (record_value(job_id, 'qsub_time') for job_id in (PRE_JOB_ID, RUN_JOB_ID, POST_JOB_ID))
+    pre_elapse_time, run_elapse_time, post_elapse_time = (record_value(job_id, 'elapsed_time') for job_id in (PRE_JOB_ID, RUN_JOB_ID, POST_JOB_ID))
 
     # Avoid duplicate username and None:
     user_name_set = {own for own in [pre_owner, run_owner, post_owner] if own is not None}
@@ -359,243 +345,84 @@ def process_job_data(job_folder_path):
     actual_date = min((dt for dt in first_date if dt), default=None)
     print("Actual Submission Date:", actual_date)
 
-    # --- REPLACED: Saving JOB_ID in the Database ---
-    try:
-        if run_code: # Only insert if we have a valid run_code
-            insert_elapse_time(run_code, project_code, task_code, run_num, workflow_step,
-                               actual_date, user_name, PRE_JOB_ID, pre_elapse_time,
-                               RUN_JOB_ID, run_elapse_time, POST_JOB_ID, post_elapse_time,
-                               connection)
-            print("Info from qacct -j JOB_ID has been processed and data inserted.")
-    except Exception as e:
-        print(f"Error inserting Elapse Time data: {e}")
-        connection.rollback()
-        
-    # Read and insert RTM Simulation Metrics CSV File and Insert the Values into DB
-    simulation_files_rtm = find_csv_files(base_dir, post_simulationMetrics)
-
-    for file_path in simulation_files_rtm:
-        try:
-            print(f"Processing RTM simulation metrics file: {file_path}")
-            df = pd.read_csv(file_path, delimiter=';', skiprows=1, header=None)
-            df.columns = ['MONITORS', 'RESULTS']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Table_Ext_Aero}
-                               (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, POST_JOB_ID, MONITORS, RESULTS) VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-                               (run_code, project_code, task_code, run_num, POST_JOB_ID, str(row['MONITORS']), str(row['RESULTS'])))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing RTM simulation metrics file {file_path}: {e}")
-            connection.rollback()
-
-    # Read and insert POST CFx CSV File and Insert the Values into DB
-    simulation_files_cfx = find_csv_files(base_dir, post_CFx)
-
-    for file_path in simulation_files_cfx:
-        try:
-            print(f"Processing CFx file: {file_path}")
-            df = pd.read_csv(file_path, skiprows=1, header=None)
-            df.columns = ['ITERATION', 'CFx_Monitor']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Aero_CFx}
-                               (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, ITERATION, CFx_Monitor) VALUES (%s, %s, %s, %s, %s, %s)""",
-                               (run_code, project_code, task_code, run_num, str(row['ITERATION']), str(row['CFx_Monitor'])))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing CFx file {file_path}: {e}")
-            connection.rollback()
-
-    # Read and insert PoOST CFz CSV File and Insert the Values into DB
-    simulation_files_cfz = find_csv_files(base_dir, post_CFz)
 
-    for file_path in simulation_files_cfz:
-        try:
-            print(f"Processing CFz file: {file_path}")
-            df = pd.read_csv(file_path, skiprows=1, usecols=[0, 1], header=None)
-            df.columns = ['ITERATION', 'CFz_Monitor']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Aero_CFz}
-                               (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, ITERATION, CFz_Monitor) VALUES (%s, %s, %s, %s, %s, %s)""",
-                               (run_code, project_code, task_code, run_num, str(row['ITERATION']), str(row['CFz_Monitor'])))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing CFz file {file_path}: {e}")
-            connection.rollback()
+    # Context of every row of the run
+    data.context = {'RUN_CODE': run_code, 'PROJECT_CODE': project_code, 'TASK_CODE': task_code,
+                    'RUN_NUMBER': run_num, 'POST_JOB_ID': POST_JOB_ID}
+    if run_code: # Only insert if we have a valid run_code
+        data.elapse_row = elapse_time_row(run_code, project_code, task_code, run_num, workflow_step,
+                                          actual_date, user_name, PRE_JOB_ID, pre_elapse_time,
+                                          RUN_JOB_ID, run_elapse_time, POST_JOB_ID, post_elapse_time)
 
-    # Read and insert XWD Simulation Metrics CSV File and Insert the Values into DB
-    simulation_files_xwd = [f for f in csv_files_with_path if os.path.basename(f) in post_simulationMetrics_XWD]
+    # Every registered CSV file, inserted into the DB by write_job_data
+    data.files, errors = scan_registered_files(folder_index, data.context)
+    data.errors.extend(errors)
 
-    for file_path in simulation_files_xwd:
-        try:
-            print(f"Processing XWD simulation metrics file: {file_path}")
-            df = pd.read_csv(file_path, delimiter=';', skiprows=1, header=None)
-            df.columns = ['MONITORS', 'RESULTS']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Table_Ext_Aero}
-                               (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, MONITORS, RESULTS) VALUES (%s, %s, %s, %s, %s, %s)""",
-                               (run_code, project_code, task_code, run_num, str(row['MONITORS']), str(row['RESULTS'])))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing XWD simulation metrics file {file_path}: {e}")
-            connection.rollback()
-
-
-    # Read and insert all 'cumulated' CSV File and Insert the Values into DB
-    cumulated_files = find_csv_files(base_dir, tuple(post_cummulative))
-
-    for file_path in cumulated_files:
-        try:
-            post_csv_file_name = os.path.basename(file_path)
-            print(f"Processing cumulated file: {file_path}")
-            df = pd.read_csv(file_path, skiprows=1, header=None)
-            df.columns = ['POSITION_m', 'FORCE_N', 'ACCUMULATED_FORCE_N', 'PROFILE_LOWER_m', 'PROFILE_UPPER_m']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Table_Cummulative}
-                               (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, POST_CSV_FILE_NAME, POSITION_m, FORCE_N, ACCUMULATED_FORCE_N, PROFILE_LOWER_m, PROFILE_UPPER_m)
-                               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                               (run_code, project_code, task_code, run_num, post_csv_file_name, row['POSITION_m'], row['FORCE_N'], row['ACCUMULATED_FORCE_N'], row['PROFILE_LOWER_m'], row['PROFILE_UPPER_m']))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing cumulated file {file_path}: {e}")
-            connection.rollback()
-
-    # Read and insert Residuals CSV File and Insert the Values into DB
-    residual_files = find_csv_files(base_dir, post_residuals)
-
-    for file_path in residual_files:
-        try:
-            print(f"Processing residual file: {file_path}")
-            df = pd.read_csv(file_path, skiprows=1, header=None)
-            df.columns = ['ITERATION', 'Tdr_RESIDUAL', 'Tke_RESIDUAL', 'CONTINUITY', 'X_MOMENTUM', 'Y_MOMENTUM', 'Z_MOMENTUM']
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Table_Residuals}
-                                (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, ITERATION, CONTINUITY, X_MOMENTUM, Y_MOMENTUM, Z_MOMENTUM, Tke_RESIDUAL, Tdr_RESIDUAL)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                                (run_code, project_code, task_code, run_num, str(row['ITERATION']), str(row['CONTINUITY']), str(row['X_MOMENTUM']), str(row['Y_MOMENTUM']), str(row['Z_MOMENTUM']), str(row['Tke_RESIDUAL']), str(row['Tdr_RESIDUAL'])))
-                connection.commit()
-        except Exception as e:
-            print(f"Error processing residual file {file_path}: {e}")
-            connection.rollback()
-
-    # Read and insert HEAD PRESSURE PULSE CSV File and Insert the Values into DB
-    hpp_files = find_csv_files(base_dir, post_head_Pr_pulse)
-
-    for file_path in hpp_files: # Loop through found HPP files, though typically only one is expected
-        try:
-            print(f"Processing HEAD PRESSURE PULSE file: {file_path}")
-            df = pd.read_csv(file_path, skiprows=1, header=None)
-            df.columns = [
-                          'Line_Probe_1500mm_Direction', 'Line_Probe_1500mm_Pressure',
-                          'Line_Probe_1800mm_Direction', 'Line_Probe_1800mm_Pressure',
-                          'Line_Probe_2100mm_Direction', 'Line_Probe_2100mm_Pressure',
-                          'Line_Probe_2400mm_Direction', 'Line_Probe_2400mm_Pressure',
-                          'Line_Probe_2700mm_Direction', 'Line_Probe_2700mm_Pressure',
-                          'Line_Probe_3000mm_Direction', 'Line_Probe_3000mm_Pressure',
-                          'Line_Probe_3300mm_Direction', 'Line_Probe_3300mm_Pressure'
-                          ]
-            for index, row in df.iterrows():
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Table_head_Pr_pulse}
-                               (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER,
-                                Line_Probe_1500mm_Direction, Line_Probe_1500mm_Pressure,
-                                Line_Probe_1800mm_Direction, Line_Probe_1800mm_Pressure,
-                                Line_Probe_2100mm_Direction, Line_Probe_2100mm_Pressure,
-                                Line_Probe_2400mm_Direction, Line_Probe_2400mm_Pressure,
-                                Line_Probe_2700mm_Direction, Line_Probe_2700mm_Pressure,
-                                Line_Probe_3000mm_Direction, Line_Probe_3000mm_Pressure,
-                                Line_Probe_3300mm_Direction, Line_Probe_3300mm_Pressure)
-                               VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                               (run_code, project_code, task_code, run_num,
-                                str(row['Line_Probe_1500mm_Direction']), str(row['Line_Probe_1500mm_Pressure']),
-                                str(row['Line_Probe_1800mm_Direction']), str(row['Line_Probe_1800mm_Pressure']),
-                                str(row['Line_Probe_2100mm_Direction']), str(row['Line_Probe_2100mm_Pressure']),
-                                str(row['Line_Probe_2400mm_Direction']), str(row['Line_Probe_2400mm_Pressure']),
-                                str(row['Line_Probe_2700mm_Direction']), str(row['Line_Probe_2700mm_Pressure']),
-                                str(row['Line_Probe_3000mm_Direction']), str(row['Line_Probe_3000mm_Pressure']),
-                                str(row['Line_Probe_3300mm_Direction']), str(row['Line_Probe_3300mm_Pressure'])))
-            connection.commit()
-        except Exception as e:
-            print(f"Error reading or inserting HEAD PRESSURE PULSE CSV file {file_path}: {e}")
-            connection.rollback()
-
-
-    print("All CSV files have been processed and data inserted.")
+    # Columnar copy of the numeric series for cross-run analysis
+    archived = parquet_archive.archive_registered_files(folder_index, data.context)
+    for file_path, written in archived.items():
+        if written is not None:
+            print(f"{written} rows archived to Parquet from {file_path}")
 
     # Read the PARAMETERS.txt file from the location:
-    def read_param(base_dir, target_file = 'parameters.txt'):
+    def read_param(index, target_file = 'parameters.txt'):
         keywords = {'DESCRIPTION:': None, 'SOLVER_VERSION:': None, 'QUEUE:': None, 'WORKFLOW_STEPS:': None, 'TEMPLATE:': None}
-        for root, dirs, files in os.walk(base_dir):
-            if target_file in files:
-                file_path = os.path.join(root, target_file)
-                print(f"Found {target_file} from the path: {file_path}")
-                try:
-                    with open(file_path, 'r') as file:
-                        lines = file.readlines()
-                        for line in lines:
-                            for key in keywords:
-                                if line.strip().startswith(key):
-                                    keywords[key] = line.strip().split(key, 1)[-1].strip()
-                    # Check all keys *except* WORKFLOW_STEPS, which was already checked
-                    non_workflow_keys = {k: v for k, v in keywords.items() if k != 'WORKFLOW_STEPS:'}
-                    if all(value is not None for value in non_workflow_keys.values()):
-                        return keywords
-                    else:
-                            print(f"Warning: Not all parameters were found in {target_file} at {file_path}. Missing keys might cause issues.")
-                            return keywords # Return what was found
-                except Exception as e:
-                    print(f"Error reading the file {file_path}: {e}")
-                break # Break after finding the first parameters.txt
+        for file_path in index.find(target_file):
+            print(f"Found {target_file} from the path: {file_path}")
+            try:
+                with open(file_path, 'r') as file:
+                    lines = file.readlines()
+                    for line in lines:
+                        for key in keywords:
+                            if line.strip().startswith(key):
+                                keywords[key] = line.strip().split(key, 1)[-1].strip()
+                # Check all keys *except* WORKFLOW_STEPS, which was already checked
+                non_workflow_keys = {k: v for k, v in keywords.items() if k != 'WORKFLOW_STEPS:'}
+                if all(value is not None for value in non_workflow_keys.values()):
+                    return keywords
+                else:
+                        print(f"Warning: Not all parameters were found in {target_file} at {file_path}. Missing keys might cause issues.")
+                        return keywords # Return what was found
+            except Exception as e:
+                print(f"Error reading the file {file_path}: {e}")
+            break # Break after finding the first parameters.txt
         return None
-    # Read PARAMETERS TXT File and upload the data to the Database
-    params = read_param(base_dir)
+    # Read PARAMETERS TXT File, its row is uploaded to the Database by write_job_data
+    params = read_param(folder_index)
     if params:
-        try:
-            # Map found parameters, which might be None if file was incomplete
-            mapped_params = {
-                'JOB_DESCRIPTION': params.get('DESCRIPTION:'), 
-                'SOLVER_VERSION': params.get('SOLVER_VERSION:'), 
-                'QUEUE_TYPE': params.get('QUEUE:'), 
-                'WORKFLOW_STEPS': params.get('WORKFLOW_STEPS:'), # This was already found
-                'TEMPLATE': params.get('TEMPLATE:')
-            }
-            df = pd.DataFrame([mapped_params], columns=['JOB_DESCRIPTION', 'SOLVER_VERSION', 'QUEUE_TYPE', 'WORKFLOW_STEPS', 'TEMPLATE'])
-            for index, row in df.iterrows():
-                # Use the main cursor, no need to create a new one here
-                cursor.execute(f"""INSERT INTO {db_table.Staging_Parameters}
-                              (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, JOB_DESCRIPTION, SOLVER_VERSION, QUEUE_TYPE, WORKFLOW_STEPS, TEMPLATE)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                            (run_code, project_code, task_code, run_num, row['JOB_DESCRIPTION'], row['SOLVER_VERSION'], row['QUEUE_TYPE'], row['WORKFLOW_STEPS'], row['TEMPLATE']))
-                connection.commit()
-            print("Parameter file have been processed and data inserted.")
-        except Exception as e:
-            print(f"Error processing parameters from parameters.txt: {e}")
-            connection.rollback()
+        # Map found parameters, which might be None if file was incomplete
+        mapped_params = {
+            'JOB_DESCRIPTION': params.get('DESCRIPTION:'), 
+            'SOLVER_VERSION': params.get('SOLVER_VERSION:'), 
+            'QUEUE_TYPE': params.get('QUEUE:'), 
+            'WORKFLOW_STEPS': params.get('WORKFLOW_STEPS:'), # This was already found
+            'TEMPLATE': params.get('TEMPLATE:')
+        }
+        data.parameters_row = (run_code, project_code, task_code, run_num, mapped_params['JOB_DESCRIPTION'],
+                               mapped_params['SOLVER_VERSION'], mapped_params['QUEUE_TYPE'],
+                               mapped_params['WORKFLOW_STEPS'], mapped_params['TEMPLATE'])
     else:
         print("Parameters.txt not found or could not be read. Skipping parameter insertion.")
 
-    # --- Fetch Elapse Time Info ---
-
-    
     # --- Find FLAGS in each subfolder and add them in the database ---
-    def find_flags_in_subfolders(base_dir, possible_tags):
+    def find_flags_in_subfolders(index, possible_tags):
         folder_to_flag = {}
-        if not os.path.isdir(base_dir):
-            print(f"Base directory does not exist or is not a directory: {base_dir}")
+        if not os.path.isdir(index.base_dir):
+            print(f"Base directory does not exist or is not a directory: {index.base_dir}")
             return folder_to_flag
-        for folder_names in os.listdir(base_dir):
-            subfolder_path = os.path.join(base_dir, folder_names)
-            if os.path.isdir(subfolder_path):
-                found_flag_in_subfolder = False
-                for item in os.listdir(subfolder_path):
-                    for flag in possible_tags:
-                        if item.startswith(flag):
-                            folder_to_flag[folder_names] = flag
-                            found_flag_in_subfolder = True
-                            break
-                    if found_flag_in_subfolder:
+        for folder_names in index.step_folders():
+            found_flag_in_subfolder = False
+            for item in index.step_entries(folder_names):
+                for flag in possible_tags:
+                    if item.name.startswith(flag):
+                        folder_to_flag[folder_names] = flag
+                        found_flag_in_subfolder = True
                         break
+                if found_flag_in_subfolder:
+                    break
         return folder_to_flag
 
-    flag_map = find_flags_in_subfolders(base_dir, possible_tags)
+    flag_map = find_flags_in_subfolders(folder_index, possible_tags)
     print("The tags found are", flag_map)
 
     def get_tag_from_group(flag_map, group):
@@ -604,64 +431,251 @@ def process_job_data(job_folder_path):
                 return flag_map[fol]
         return None
 
-    # --- Single-line insertion logic for Table_Flag, reflecting the current job state ---
+    # --- Single-line Table_Flag row, reflecting the current job state ---
     if run_code:
-        try:
-            pre_tag = get_tag_from_group(flag_map, pre_folders)
-            run_tag = get_tag_from_group(flag_map, run_folders)
-            post_tag = get_tag_from_group(flag_map, post_folders)
-
-            # Start with all NULLs, set only the detected tags for this workflow run
-            final_pre_tag, final_run_tag, final_post_tag = None, None, None
-            steps_to_run = workflow_step.upper()
-            tag_found = False
-            
-            if 'PRE' in steps_to_run and pre_tag:
+        pre_tag = get_tag_from_group(flag_map, pre_folders)
+        run_tag = get_tag_from_group(flag_map, run_folders)
+        post_tag = get_tag_from_group(flag_map, post_folders)
+
+        # Start with all NULLs, set only the detected tags for this workflow run
+        final_pre_tag, final_run_tag, final_post_tag = None, None, None
+        steps_to_run = workflow_step.upper()
+        tag_found = False
+        
+        if 'PRE' in steps_to_run and pre_tag:
+            final_pre_tag = pre_tag
+            tag_found = True
+        if 'RUN' in steps_to_run and run_tag:
+            final_run_tag = run_tag
+            tag_found = True
+        if 'POST' in steps_to_run and post_tag:
+            final_post_tag = post_tag
+            tag_found = True
+
+        # For 'ALL', only insert if ALL three flags are present
+        if 'ALL' in steps_to_run:
+            if not (pre_tag and run_tag and post_tag):
+                tag_found = False # Wait until all done
+            else:
                 final_pre_tag = pre_tag
-                tag_found = True
-            if 'RUN' in steps_to_run and run_tag:
                 final_run_tag = run_tag
-                tag_found = True
-            if 'POST' in steps_to_run and post_tag:
                 final_post_tag = post_tag
                 tag_found = True
 
-            # For 'ALL', only insert if ALL three flags are present
-            if 'ALL' in steps_to_run:
-                if not (pre_tag and run_tag and post_tag):
-                    tag_found = False # Wait until all done
-                else:
-                    final_pre_tag = pre_tag
-                    final_run_tag = run_tag
-                    final_post_tag = post_tag
-                    tag_found = True
-
-            if tag_found:
-                # Use the main cursor for this final operation
-                cursor.execute(f"""
-                    INSERT INTO {db_table.Table_Flag}
-                    (RUN_CODE, PROJECT_CODE, TASK_CODE, RUN_NUMBER, PRE_TAG, RUN_TAG, POST_TAG)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """, (run_code, project_code, task_code, run_num,
-                      final_pre_tag, final_run_tag, final_post_tag))
-                connection.commit()
-                print(f"New row INSERTED for {run_code} with final status for job: {steps_to_run}.")
+        if tag_found:
+            data.tag_row = (run_code, project_code, task_code, run_num, final_pre_tag, final_run_tag, final_post_tag)
+            data.tag_source = f"tags:{steps_to_run}"
+        else:
+            print("No relevant finished steps found to insert a new tag record for this job submission.")
+
+    return data
+
+def write_job_data(connection, data, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+    """
+    Writes a JobData in the database, one transaction per source.
+    A failing source is rolled back and reported in data.errors, the other sources are still written.
+    prepare_ingest_tables must have been run.
+    """
+    run_code = data.run_code
+
+    def record(inserted):
+        if inserted is None:
+            data.unchanged += 1
+        else:
+            data.inserted += inserted
+        return inserted
+
+    # --- REPLACED: Saving JOB_ID in the Database ---
+    if data.elapse_row is not None:
+        try:
+            # One row per workflow step submission, replaced when the job folder is ingested again
+            inserted = record(replace_computed_row(connection, db_table.table_elapse, ELAPSE_COLUMNS, data.elapse_row,
+                                                   run_code, f"qacct:{data.workflow_step.upper()}"))
+            if inserted is None:
+                print("Info from qacct -j JOB_ID unchanged since the last ingestion, skipped.")
+            else:
+                print("Info from qacct -j JOB_ID has been processed and data inserted.")
+        except Exception as e:
+            print(f"Error inserting Elapse Time data: {e}")
+            data.errors.append(f"elapse time: {e}")
+
+    # Insert the values of every registered CSV file into the DB
+    write_registered_files(connection, data, batch_size)
+    print("All CSV files have been processed and data inserted.")
+
+    if data.parameters_row is not None:
+        try:
+            if run_code:
+                inserted = replace_computed_row(connection, db_table.Staging_Parameters, PARAMETERS_COLUMNS,
+                                                data.parameters_row, run_code, 'parameters.txt')
             else:
-                print("No relevant finished steps found to insert a new tag record for this job submission.")
+                inserted = db_ingest.ingest_rows(connection, db_table.Staging_Parameters, PARAMETERS_COLUMNS,
+                                                 [data.parameters_row])
+            if record(inserted) is None:
+                print("Parameter file unchanged since the last ingestion, skipped.")
+            else:
+                print("Parameter file have been processed and data inserted.")
+        except Exception as e:
+            print(f"Error processing parameters from parameters.txt: {e}")
+            data.errors.append(f"parameters: {e}")
 
+    if data.tag_row is not None:
+        try:
+            # One row per workflow step submission, replaced when the tags change
+            inserted = record(replace_computed_row(connection, db_table.Table_Flag, TAG_COLUMNS, data.tag_row,
+                                                   run_code, data.tag_source))
+            if inserted is None:
+                print(f"Tags of {run_code} unchanged for job: {data.workflow_step.upper()}, skipped.")
+            else:
+                print(f"Row INSERTED for {run_code} with final status for job: {data.workflow_step.upper()}.")
         except Exception as e:
             print(f"Error inserting TAG data: {e}")
-            connection.rollback()
-        finally:
-            # Close cursor and connection here at the very end
-            cursor.close()
-            connection.close()
-            print("Database connection closed.")
+            data.errors.append(f"tags: {e}")
+    return data
+
+def process_job_data(job_folder_path, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+    """Ingests one job folder in the current process, exits if it cannot be ingested."""
+    connection = None # Initialize connection to None
+    try:
+        connection = get_db_connection()
+        print("Connected Successfully to MARIADB")
+    except Exception as e:
+        print(f"Connection not successful: {e}")
+        sys.exit(1) # Exit if DB connection fails
+
+    try:
+        data = scan_job_folder(job_folder_path)
+        prepare_ingest_tables(connection)
+        return write_job_data(connection, data, batch_size)
+    except IngestError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        connection.close()
+        print("Database connection closed.")
+
+def find_job_folders(path, max_depth=2):
+    """
+    Returns the job folders found in path: path itself if it is a job (run) folder, otherwise
+    the job folders of its sub-folders, down to max_depth levels (project directory, project root).
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = [(entry.name, entry.path, entry.is_dir()) for entry in it]
+    except OSError as e:
+        print(f"Cannot read the folder {path}: {e}")
+        return []
+    if is_job_folder(entries):
+        return [path]
+    if max_depth <= 0:
+        return []
+    sub_dirs = sorted(entry_path for _, entry_path, is_dir in entries if is_dir)
+    folders = []
+    for sub_dir in sub_dirs:
+        folders.extend(find_job_folders(sub_dir, max_depth - 1))
+    return folders
+
+def is_job_folder(entries):
+    """entries: (name, path, is_dir) of a folder content. A run folder has .JOB_STEPS or a step folder."""
+    return any((name == JOB_FOLDER_MARKER and not is_dir) or (is_dir and STEP_FOLDER_PATTERN.fullmatch(name))
+               for name, _, is_dir in entries)
+
+def _write_folder(data, batch_size):
+    # runs in a writer thread, with its own pooled connection
+    connection = get_db_connection()
+    try:
+        return write_job_data(connection, data, batch_size)
+    finally:
+        connection.close()
+
+def ingest_folders(folders, jobs=DEFAULT_JOBS, writers=DEFAULT_WRITERS, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+    """
+    Ingests many job folders: they are scanned (qacct, file hashes, Parquet archive) by a pool of `jobs`
+    processes, their files are parsed and written by `writers` threads. Rows are streamed in batches
+    by the writers, no parsed file is held in memory; at most jobs + writers folders are in progress.
+    The Parquet archive of each folder is written by the scanning processes, see scan_job_folder.
+    Progress and failures are printed per folder.
+    Returns {folder: JobData, or the exception that stopped its ingestion}.
+    """
+    connection = get_db_connection()
+    try:
+        prepare_ingest_tables(connection)
+    finally:
+        connection.close()
+
+    total = len(folders)
+    waiting = deque(folders)
+    scans, writes = {}, {}
+    results = {}
+
+    def report(folder, result):
+        results[folder] = result
+        if isinstance(result, Exception):
+            status = f"FAILED: {result}"
+        else:
+            status = ("done with errors, " if result.errors else "done, ") + result.summary()
+        print(f"[{len(results)}/{total}] {folder}: {status}")
+
+    with ProcessPoolExecutor(max_workers=jobs) as scanners, ThreadPoolExecutor(max_workers=writers) as writer_pool:
+        while waiting or scans or writes:
+            while waiting and len(scans) + len(writes) < jobs + writers:
+                folder = waiting.popleft()
+                scans[scanners.submit(scan_job_folder, folder)] = folder
+            done, _ = wait(list(scans) + list(writes), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in scans:
+                    folder = scans.pop(future)
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        report(folder, e)
+                        continue
+                    writes[writer_pool.submit(_write_folder, data, batch_size)] = folder
+                else:
+                    folder = writes.pop(future)
+                    try:
+                        report(folder, future.result())
+                    except Exception as e:
+                        report(folder, e)
+    return results
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 db_workflow.py <job_folder_path>")
+    parser = argparse.ArgumentParser(
+        description="Ingests job folders in the database. A project directory ingests every job folder it holds.")
+    parser.add_argument("paths", nargs="+", metavar="job_folder_path",
+                        help="job folder, project directory or project root directory")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help=f"processes parsing the job folders (default {DEFAULT_JOBS})")
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS,
+                        help=f"threads writing in the database (default {DEFAULT_WRITERS})")
+    parser.add_argument("--batch-size", type=int, default=db_ingest.DEFAULT_BATCH_SIZE,
+                        help=f"rows per insert batch (default {db_ingest.DEFAULT_BATCH_SIZE})")
+    args = parser.parse_args()
+    if args.jobs < 1 or args.writers < 1 or args.batch_size < 1:
+        parser.error("--jobs, --writers and --batch-size must be positive")
+
+    job_folders = []
+    for path in args.paths:
+        found = find_job_folders(path)
+        if not found:
+            print(f"No job folder found in {path}")
+        job_folders.extend(found)
+    if not job_folders:
+        sys.exit(1)
+
+    if len(args.paths) == 1 and job_folders == args.paths:
+        # a single job folder (e.g. from the job monitor) is ingested in this process
+        process_job_data(job_folders[0], args.batch_size)
+        sys.exit(0)
+
+    try:
+        results = ingest_folders(job_folders, args.jobs, args.writers, args.batch_size)
+    except (IngestError, pymysql.Error) as e:
+        print(e)
         sys.exit(1)
-    job_folder_path = sys.argv[1]
-    process_job_data(job_folder_path)
\ No newline at end of file
+    failed = [folder for folder, result in results.items() if isinstance(result, Exception) or result.errors]
+    print(f"{len(results) - len(failed)}/{len(results)} job folders ingested")
+    for folder in failed:
+        print(f"Failed: {folder}")
+    sys.exit(1 if failed else 0)
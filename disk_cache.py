@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+# Root folder of the on-disk caches, shared by every entry point of the workflow
+CACHE_DIR = os.environ.get(
+    "AEROX_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+
+
+class DiskCache:
+    """
+    Small JSON cache stored as one file per key under CACHE_DIR/<namespace>.
+
+    Entries older than ttl seconds are ignored (ttl=None: never expire).
+    Writes are atomic, so concurrent workflow invocations never read a partial file.
+    Cache errors are never fatal: a failing read is a miss and a failing write is skipped.
+    """
+
+    def __init__(self, namespace, ttl=None, cache_dir=None) -> None:
+        self.directory = os.path.join(cache_dir or CACHE_DIR, namespace)
+        self.ttl = ttl
+
+    def path(self, key):
+        key = str(key)
+        if not re.match(r'^[A-Za-z0-9_.\-]+$', key):
+            key = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key, ttl=None):
+        """Returns the cached value, None if missing, expired or unreadable."""
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            with open(self.path(key), "r") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if ttl is not None and time.time() - entry.get("time", 0) > ttl:
+            return None
+        return entry.get("value")
+
+    def set(self, key, value):
+        """Stores a JSON serializable value. Returns False if the cache is not writable."""
+        path = self.path(key)
+        tmp_path = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as file:
+                json.dump({"time": time.time(), "value": value}, file)
+            os.replace(tmp_path, path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Cannot write cache entry {path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def invalidate(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
@@ -0,0 +1,99 @@
+import os
+
+
+class IndexedEntry:
+    """A file or folder recorded by JobFolderIndex. Size and mtime are read on first access."""
+
+    __slots__ = ("step", "name", "path", "is_dir", "_entry", "_stat")
+
+    def __init__(self, step, entry: os.DirEntry) -> None:
+        self.step = step
+        self.name = entry.name
+        self.path = entry.path
+        self.is_dir = entry.is_dir(follow_symlinks=False)
+        self._entry = entry
+        self._stat = None
+
+    def __repr__(self) -> str:
+        return f"IndexedEntry({self.path})"
+
+    def _get_stat(self):
+        if self._stat is None:
+            try:
+                self._stat = self._entry.stat()
+            except OSError: # broken symlink
+                self._stat = self._entry.stat(follow_symlinks=False)
+        return self._stat
+
+    @property
+    def size(self):
+        return self._get_stat().st_size
+
+    @property
+    def mtime(self):
+        return self._get_stat().st_mtime
+
+
+class JobFolderIndex:
+    """
+    Index of a job folder built with a single os.scandir walk.
+
+    Entries are grouped by step folder, the first level sub-folder (PRE, RUN-FAILED, POST-1...).
+    Files located directly in the job folder belong to the step "".
+    Files are kept in the os.walk top-down order so lookups return the same first match.
+    """
+
+    ROOT = ""
+
+    def __init__(self, base_dir) -> None:
+        self.base_dir = base_dir
+        # step folder name -> direct children of the step folder
+        self._step_entries = {}
+        # every file of the tree, in walk order
+        self._files = []
+        # file name -> list of IndexedEntry
+        self._by_name = {}
+        self._walk(base_dir, self.ROOT, 0)
+
+    def _walk(self, path, step, depth):
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError as e:
+            print(f"Cannot read the folder {path}: {e}")
+            return
+        sub_dirs = []
+        for entry in entries:
+            is_step_folder = depth == 0 and entry.is_dir(follow_symlinks=False)
+            indexed = IndexedEntry(entry.name if is_step_folder else step, entry)
+            if depth == 1:
+                self._step_entries[step].append(indexed)
+            if indexed.is_dir:
+                if is_step_folder:
+                    self._step_entries[entry.name] = []
+                sub_dirs.append(indexed)
+            else:
+                self._files.append(indexed)
+                self._by_name.setdefault(entry.name, []).append(indexed)
+        for sub_dir in sub_dirs:
+            self._walk(sub_dir.path, sub_dir.step, depth + 1)
+
+    def step_folders(self):
+        """Returns the names of the first level sub-folders."""
+        return list(self._step_entries)
+
+    def step_entries(self, step):
+        """Returns the direct children (files and folders) of a step folder."""
+        return self._step_entries.get(step, [])
+
+    def files(self):
+        """Returns every file of the job folder."""
+        return list(self._files)
+
+    def find(self, name):
+        """Returns the paths of the files named name, in walk order."""
+        return [entry.path for entry in self._by_name.get(name, [])]
+
+    def find_suffix(self, suffix):
+        """Returns the paths of the files ending with suffix, in walk order."""
+        return [entry.path for entry in self._files if entry.name.endswith(suffix)]
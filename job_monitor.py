@@ -0,0 +1,448 @@
+"""
+Job monitoring service for Alstom AeroX Software projects.
+
+Long-lived replacement of the per-minute cron invocations of job_state_handler.sh.
+Every active job folder is kept in memory, qstat is polled once per cycle for all
+of them and the same state transitions as the shell script are applied
+(detect_job_status, remove_job_info, run_tzs_script).
+
+Job folders are registered by the workflow through a spool folder, one file per
+job folder, so the service can be restarted without losing them.
+
+qstat and qdel need the SGE environment (SGE_ROOT, SGE_CELL...). When the service
+is started without it (cron, systemd), it is loaded from the login profile as the
+shell script did (source $HOME/.bash_profile), see load_sge_environment.
+"""
+
+import argparse
+import fcntl
+import glob
+import hashlib
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+from log import Log
+import process_runner
+from qstat import QstatSnapshot
+import qstat
+
+MONITOR_DIR: str = os.environ.get("AEROX_MONITOR_DIR", os.path.expanduser("~/.aerox_job_monitor"))
+QDEL: str = os.environ.get("AEROX_QDEL", "qdel")
+POLL_INTERVAL: int = 60
+COMMAND_TIMEOUT: int = 120
+JOB_STEPS: str = ".JOB_STEPS"
+# sourced for the SGE environment when SGE_ROOT is not set
+SGE_PROFILE: str = os.environ.get("AEROX_SGE_PROFILE", os.path.expanduser("~/.bash_profile"))
+TZS_SCRIPT_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_workflow.py")
+
+# detect_job_status return codes, same meaning as in job_state_handler.sh
+RUNNING = 0             # no action
+FINISHED = 1            # FINISHED file found
+FAILED = 2              # FINISHED + FAILED file found
+ABORTED = 3             # FINISHED + ABORT file found (active job killed by user)
+TERMINATED_ABORT = 4    # TERMINATED + ABORT file found (walltime exceeded)
+TERMINATED_DELETED = 5  # TERMINATED + TO-DELETE file found (pending job killed by user)
+JOB_ERROR = 6           # Error state in qstat
+NOT_IN_QUEUE = 7        # job not in qstat anymore without state file
+WORKFLOW_ERROR = 10     # should not happen
+
+
+##############
+# JOB STEPS  #
+##############
+
+def read_job_infos(job_folder: str) -> List[Tuple[str, str]]:
+    """Returns the (step, job_id) pairs stored in the .JOB_STEPS file of a job folder."""
+    try:
+        with open(os.path.join(job_folder, JOB_STEPS), "r") as file:
+            content = file.read()
+    except OSError:
+        return []
+    infos = []
+    for info in content.split():
+        step, _, job_id = info.rpartition(",")
+        if step and job_id:
+            infos.append((step, job_id))
+    return infos
+
+
+def write_job_infos(job_folder: str, infos: List[Tuple[str, str]]) -> None:
+    with open(os.path.join(job_folder, JOB_STEPS), "w") as file:
+        file.write("".join(f"{step},{job_id} " for step, job_id in infos))
+
+
+def add_job_infos(job_folder: str, infos: List[Tuple[str, str]]) -> None:
+    """Appends 'STEP,JOB_ID ' entries to .JOB_STEPS, as job_state_handler.sh --add."""
+    with open(os.path.join(job_folder, JOB_STEPS), "a") as file:
+        file.write("".join(f"{step},{job_id} " for step, job_id in infos))
+
+
+def remove_job_info(job_folder: str, step: str) -> None:
+    infos = read_job_infos(job_folder)
+    write_job_infos(job_folder, [(s, job_id) for s, job_id in infos if s != step])
+
+
+def remove_job_steps(job_folder: str) -> None:
+    try:
+        os.remove(os.path.join(job_folder, JOB_STEPS))
+    except OSError:
+        pass
+
+
+################
+# REGISTRATION #
+################
+
+def _registration_path(job_folder: str, monitor_dir: str = None) -> str:
+    key = hashlib.sha1(os.path.abspath(job_folder).encode("utf-8")).hexdigest()
+    return os.path.join(monitor_dir or MONITOR_DIR, "jobs", key + ".job")
+
+
+def register(job_folder: str, monitor_dir: str = None) -> None:
+    """Adds a job folder to the folders watched by the monitoring service."""
+    path = _registration_path(job_folder, monitor_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(os.path.abspath(job_folder))
+
+
+def unregister(job_folder: str, monitor_dir: str = None) -> None:
+    try:
+        os.remove(_registration_path(job_folder, monitor_dir))
+    except OSError:
+        pass
+
+
+def registered_job_folders(monitor_dir: str = None) -> List[str]:
+    folders = []
+    for path in glob.glob(os.path.join(monitor_dir or MONITOR_DIR, "jobs", "*.job")):
+        try:
+            with open(path, "r") as file:
+                folders.append(file.read().strip())
+        except OSError:
+            continue
+    return folders
+
+
+def _lock_path(monitor_dir: str = None) -> str:
+    return os.path.join(monitor_dir or MONITOR_DIR, "job_monitor.lock")
+
+
+def _try_lock(monitor_dir: str = None):
+    """Returns the locked file object, None if another service holds the lock."""
+    os.makedirs(monitor_dir or MONITOR_DIR, exist_ok=True)
+    lock_file = open(_lock_path(monitor_dir), "a+")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def is_running(monitor_dir: str = None) -> bool:
+    lock_file = _try_lock(monitor_dir)
+    if lock_file is None:
+        return True
+    lock_file.close()
+    return False
+
+
+def ensure_running(monitor_dir: str = None) -> bool:
+    """
+    Starts the monitoring service in the background if it is not running.
+    Register the job folder before calling it: a service about to stop re-reads the
+    registrations after releasing its lock.
+    Returns True if a new service has been started.
+    """
+    if is_running(monitor_dir):
+        return False
+    monitor_dir = monitor_dir or MONITOR_DIR
+    with open(os.path.join(monitor_dir, "job_monitor.out"), "a") as output:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--monitor-dir", monitor_dir],
+                         stdin=subprocess.DEVNULL, stdout=output, stderr=subprocess.STDOUT,
+                         start_new_session=True, close_fds=True)
+    return True
+
+
+##########
+# STATUS #
+##########
+
+def touch(path: str) -> None:
+    try:
+        open(path, "a").close()
+    except OSError:
+        pass
+
+
+def detect_job_status(step_folder: str, job_id: str, snapshot: QstatSnapshot) -> int:
+    """
+    Returns the status code of a step job (see the codes above), as job_state_handler.sh.
+    A job neither in qstat nor flagged by a state file gets a TERMINATED file.
+    """
+    if snapshot.is_error(job_id):
+        return JOB_ERROR
+    if snapshot.is_queued(job_id):
+        return RUNNING
+
+    try:
+        names = os.listdir(step_folder)
+    except OSError:
+        names = []
+
+    def found(flag):
+        return any(flag in name for name in names)
+
+    if found("FINISHED"):
+        if found("FAILED"):
+            return FAILED
+        if found("ABORT"):
+            return ABORTED
+        return FINISHED
+    if found("TERMINATED"):
+        if found("ABORT"):
+            return TERMINATED_ABORT
+        if found("TO-DELETE"):
+            return TERMINATED_DELETED
+        return WORKFLOW_ERROR
+    touch(os.path.join(step_folder, "TERMINATED"))
+    return NOT_IN_QUEUE
+
+
+###################
+# SGE ENVIRONMENT #
+###################
+
+def load_sge_environment(profile: str = SGE_PROFILE) -> List[str]:
+    """
+    Sources profile in bash and adds the variables it sets to os.environ, unless SGE_ROOT is already set.
+    Returns the names of the variables added or changed.
+    """
+    if os.environ.get("SGE_ROOT"):
+        return []
+    if not os.path.isfile(profile):
+        print(f"SGE_ROOT is not set and {profile} does not exist, qstat may fail")
+        return []
+    result = process_runner.run(["/bin/bash", "-c", '. "$1" >/dev/null 2>&1; env -0', "bash", profile],
+                                COMMAND_TIMEOUT)
+    if not result.ok:
+        print(f"Cannot load the SGE environment: {result.describe_failure()}")
+        return []
+    env = dict(entry.split("=", 1) for entry in result.stdout.split("\0") if "=" in entry)
+    changed = [name for name, value in env.items()
+               if name not in ("PWD", "OLDPWD", "SHLVL", "_") and os.environ.get(name) != value]
+    os.environ.update({name: env[name] for name in changed})
+    return changed
+
+
+###########
+# MONITOR #
+###########
+
+class JobMonitor:
+    """Keeps the active job folders in memory and applies the job state transitions each cycle."""
+
+    def __init__(self, monitor_dir: str = None, interval: int = POLL_INTERVAL,
+                 qstat_user: str = "*", logger: Log = None, tail_ingest: bool = True) -> None:
+        self.monitor_dir = monitor_dir or MONITOR_DIR
+        self.interval = interval
+        self.qstat_user = qstat_user
+        self.logger = logger
+        # load the convergence data of the running jobs in the database each cycle
+        self.tail_ingest = tail_ingest
+        self.job_folders: List[str] = []
+
+    def log(self, levels: str, msg: str) -> None:
+        if self.logger is not None:
+            self.logger.log_event(levels, msg)
+        else:
+            print(msg)
+
+    def load_registrations(self) -> None:
+        for job_folder in registered_job_folders(self.monitor_dir):
+            if job_folder not in self.job_folders:
+                self.log("info", f"Monitoring {job_folder}")
+                self.job_folders.append(job_folder)
+
+    def run_cycle(self) -> None:
+        """Checks every registered job folder once, with a single qstat call."""
+        self.load_registrations()
+        if not self.job_folders:
+            return
+        try:
+            snapshot = qstat.get_snapshot(self.qstat_user, refresh=True)
+        except qstat.QstatError as e:
+            self.log("warning", f"{e}, cycle skipped")
+            return
+        for job_folder in list(self.job_folders):
+            try:
+                if self.process_job_folder(job_folder, snapshot):
+                    self.job_folders.remove(job_folder)
+                    unregister(job_folder, self.monitor_dir)
+            except Exception as e:
+                self.log("error", f"Error while monitoring {job_folder}: {e}")
+
+    def serve_forever(self) -> None:
+        """Runs cycles until no job folder is left to monitor."""
+        lock_file = _try_lock(self.monitor_dir)
+        if lock_file is None:
+            self.log("info", "Job monitor already running")
+            return
+        self.log("info", f"Job monitor started, pid {os.getpid()}")
+        while True:
+            self.run_cycle()
+            if not self.job_folders:
+                # Release the lock first, then look for a folder registered meanwhile
+                lock_file.close()
+                if not registered_job_folders(self.monitor_dir):
+                    break
+                lock_file = _try_lock(self.monitor_dir)
+                if lock_file is None:
+                    break
+                continue
+            time.sleep(self.interval)
+        self.log("info", "No job left to monitor, job monitor stopped")
+
+    def process_job_folder(self, job_folder: str, snapshot: QstatSnapshot) -> bool:
+        """
+        Applies the state transitions of one job folder.
+        Returns True when every step is done and the folder is no longer monitored.
+        """
+        if not os.path.isdir(job_folder):
+            self.log("warning", f"Job folder does not exist anymore: {job_folder}")
+            return True
+        steps = read_job_infos(job_folder)
+        if not steps:
+            # .JOB_STEPS already empty, e.g. interrupted cleanup: nothing left to do
+            remove_job_steps(job_folder)
+            return True
+
+        for step, job_id in steps:
+            step_folder = os.path.join(job_folder, step)
+            status = detect_job_status(step_folder, job_id, snapshot)
+            if status == WORKFLOW_ERROR:
+                self.log("error", f"[ERROR] Should not happen: {step_folder}")
+            if status == RUNNING:
+                self.ingest_running_job(job_folder)
+                # wait for this job before checking the next steps
+                break
+            elif status == FINISHED:
+                remove_job_info(job_folder, step)
+                self.remove_sim_file_pre_step(job_folder, step_folder, step)
+            else:
+                self.log("info", f"{job_folder} {step} status {status}")
+                if status == JOB_ERROR:
+                    self.delete_job(job_id)
+                if status == NOT_IN_QUEUE:
+                    touch(os.path.join(step_folder, "TO-DELETE"))
+                if status in (FAILED, ABORTED, TERMINATED_ABORT, TERMINATED_DELETED):
+                    self.rename_step_folder(job_folder, step_folder, "FAILED" if status == FAILED else "ABORTED")
+                # one step failed: clean up all remaining steps of the job folder
+                remove_job_info(job_folder, step)
+                for remaining_step, remaining_job_id in read_job_infos(job_folder):
+                    self.delete_job(remaining_job_id)
+                    touch(os.path.join(job_folder, remaining_step, "TO-DELETE"))
+                    remove_job_info(job_folder, remaining_step)
+                break
+
+        if read_job_infos(job_folder):
+            return False
+        self.log("info", f"All jobs for {job_folder} are complete. Triggering TZS script.")
+        self.run_tzs_script(job_folder)
+        remove_job_steps(job_folder)
+        return True
+
+    def ingest_running_job(self, job_folder: str) -> None:
+        """Loads the rows appended to the residuals / cumulated forces files since the last cycle."""
+        if not self.tail_ingest:
+            return
+        try:
+            # the database modules are only needed by the tail ingestion
+            import tail_ingest
+        except ImportError as e:
+            self.log("warning", f"Tail ingestion disabled: {e}")
+            self.tail_ingest = False
+            return
+        try:
+            inserted = tail_ingest.ingest_job_folder(job_folder)
+            if inserted:
+                self.log("info", f"{inserted} new rows ingested from {job_folder}")
+        except Exception as e:
+            self.log("warning", f"Tail ingestion failed for {job_folder}: {e}")
+
+    def remove_sim_file_pre_step(self, job_folder: str, step_folder: str, step: str) -> None:
+        """Removes the PRE backup sim file once the RUN step produced its own sim file."""
+        if step != "RUN":
+            return
+        for entry in glob.glob(os.path.join(step_folder, "*.sim")):
+            if not os.path.islink(entry):
+                for backup in glob.glob(os.path.join(job_folder, "PRE", "*@meshed.sim~")):
+                    os.remove(backup)
+                break
+
+    def rename_step_folder(self, job_folder: str, step_folder: str, suffix: str) -> None:
+        dst = os.path.join(job_folder, f"{os.path.basename(step_folder)}-{suffix}")
+        try:
+            os.rename(step_folder, dst)
+        except OSError as e:
+            self.log("warning", f"Cannot rename {step_folder} to {dst}: {e}")
+
+    def delete_job(self, job_id: str) -> None:
+        result = process_runner.run([QDEL, job_id], COMMAND_TIMEOUT)
+        if not result.ok:
+            self.log("warning", result.describe_failure())
+
+    def run_tzs_script(self, job_folder: str) -> None:
+        result = process_runner.run([sys.executable, TZS_SCRIPT_PATH, job_folder], timeout=None)
+        self.log("info", result.stdout)
+        if not result.ok:
+            self.log("error", result.describe_failure())
+            self.log("error", f"TZS file Failed for {job_folder}")
+        else:
+            self.log("info", "tzs.py completed successfully")
+
+
+########
+# MAIN #
+########
+
+def setup_parser(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--serve', action='store_true', help="Run the monitoring service in the foreground")
+    parser.add_argument('--once', action='store_true', help="Run a single monitoring cycle")
+    parser.add_argument('--add', type=str, nargs='+', metavar="<job folder>", help="Register job folders")
+    parser.add_argument('--monitor-dir', type=str, default=None, help="Registration and lock folder")
+    parser.add_argument('--interval', type=int, default=POLL_INTERVAL, help="Seconds between two cycles")
+    parser.add_argument('--qstat-user', type=str, default="*", help="qstat -u argument")
+    parser.add_argument('--no-tail-ingest', action='store_true',
+                        help="Do not load the residuals of the running jobs in the database")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    setup_parser(parser)
+    args = parser.parse_args()
+    monitor_dir = args.monitor_dir or MONITOR_DIR
+    if args.add:
+        for job_folder in args.add:
+            register(job_folder, monitor_dir)
+        ensure_running(monitor_dir)
+        return
+    logger = Log("JobMonitor", monitor_dir)
+    changed = load_sge_environment()
+    if changed:
+        logger.log_event("info", f"Environment loaded from {SGE_PROFILE}: {', '.join(sorted(changed))}")
+    monitor = JobMonitor(monitor_dir, args.interval, args.qstat_user, logger, not args.no_tail_ingest)
+    if args.once:
+        monitor.run_cycle()
+    elif args.serve:
+        monitor.serve_forever()
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,42 +7,62 @@ v1.1
 
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
 import sys 
 from datetime import datetime
 import time 
 from shutil import move
 
+EVENT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+LEVELS = {"info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR, "critical": logging.CRITICAL}
+
 class Log():
 
+    """
+    Workflow log: a record costs a queue put to the caller, the log file
+    and the terminal are written by a QueueListener thread.
+    The log file has a single handler, moved with the file by move_logs.
+    """
+
     def __init__(self, log_name : str, file_path : str) -> None: 
         self.log_file_path = self._process_path(file_path, log_name)
-        self.logging = self._createLogger(self.log_file_path, 
-                "%(asctime)s [%(levelname)s] %(message)s", 
-                "%m/%d/%Y %I:%M:%S %p",
-                logging.DEBUG)
+        self._file_handler = MovableFileHandler(self.log_file_path)
+        self._file_handler.setFormatter(logging.Formatter(EVENT_FORMAT, DATE_FORMAT))
+        self._file_handler.addFilter(DestinationFilter("file"))
+        self._terminal_handler = TerminalHandler()
+        self._terminal_handler.addFilter(DestinationFilter("terminal"))
+        self._queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        self.logging = self._createLogger(self.log_file_path, self._queue_handler, logging.DEBUG)
+        self._listener = logging.handlers.QueueListener(self._queue_handler.queue,
+                self._file_handler, self._terminal_handler)
+        self._listener.start()
+        # the queued records are written before the interpreter exits
+        atexit.register(self.close)
     
     def log_event(self, levels : str, msg):
         """ Log an event with the rigth level. """
         levels_list = levels.split(",")
+        destinations = ("file", "terminal") if "terminal" in levels_list else ("file",)
+        logged = False
         for level in levels_list:
-            if level == "info":
-                self.logging.info(msg)
-            elif level == "warning":
-                self.logging.warning(msg)
-            elif level == "error":
-                self.logging.error(msg)    
-            elif level == "critical":
-                self.logging.critical(msg)
-            if level == "terminal":
-                print(msg, file=sys.stdout)
-
-    def set_log(self, std_type):
-        """ Return a custom logger class for stdout and stderr. """
+            if level in LEVELS:
+                self.logging.log(LEVELS[level], msg, extra={"destinations": destinations})
+                # printed once, whatever the number of levels
+                destinations = ("file",)
+                logged = True
+        if not logged and "terminal" in levels_list:
+            self.logging.info(msg, extra={"destinations": ("terminal",)})
+
+    def set_log(self, std_type, tee=True):
+        """ Return a custom logger class for stdout and stderr, tee echoes the messages to stdout. """
         if std_type == "stderr":
-            return LoggerWriter(self.logging.error)
-        return LoggerWriter(self.logging.info)
+            return LoggerWriter(self.logging.error, tee)
+        return LoggerWriter(self.logging.info, tee)
 
     @staticmethod
     def _process_path(file_path, log_name):
@@ -57,46 +77,139 @@ class Log():
         return os.path.join(logs_directory, log_name)
 
     @staticmethod
-    def _createLogger(logger_name, eventFormat, dateFormat, level):
-        """ Create a custom logger with the Logging library. """
+    def _createLogger(logger_name, handler, level):
+        """ Create a custom logger with the Logging library, handler is its only handler. """
         logger = logging.getLogger(logger_name)
-        fileHandler = logging.FileHandler(logger_name)
-        formatter = logging.Formatter(eventFormat, dateFormat)
-
-        fileHandler.setFormatter(formatter)
+        for previous in list(logger.handlers):
+            logger.removeHandler(previous)
+        logger.addHandler(handler)
         logger.setLevel(level)
-        logger.addHandler(fileHandler)
-    
+        logger.propagate = False
         return logger
 
     def move_logs(self, dst): 
+        """ Move the log file to dst, the records still queued are written to the moved file. """
         new_log_path = os.path.join(dst, os.path.basename(self.log_file_path))
-        move(self.log_file_path, new_log_path)
+        self._file_handler.move(new_log_path)
         self.log_file_path = new_log_path
-        self.logging = self._createLogger(self.log_file_path, 
-                "%(asctime)s [%(levelname)s] %(message)s", 
-                "%m/%d/%Y %I:%M:%S %p",
-                logging.DEBUG)
+
+    def close(self):
+        """ Write the queued records and stop the listener thread. Later records are written synchronously. """
+        if self._listener is None:
+            return
+        listener, self._listener = self._listener, None
+        listener.stop()
+        atexit.unregister(self.close)
+        self.logging.removeHandler(self._queue_handler)
+        self.logging.addHandler(self._file_handler)
+        self.logging.addHandler(self._terminal_handler)
+
+class MovableFileHandler(logging.FileHandler):
+
+    """ File handler whose file can be moved between two records. """
+
+    def move(self, dst_path):
+        """ Move the log file, records are not emitted while it is moved. """
+        self.acquire()
+        try:
+            if self.stream is not None:
+                self.stream.flush()
+                self.stream.close()
+                self.stream = None
+            dst_path = os.path.abspath(dst_path)
+            if os.path.exists(self.baseFilename):
+                move(self.baseFilename, dst_path)
+            # reopened in append mode by the next record
+            self.baseFilename = dst_path
+        finally:
+            self.release()
+
+class TerminalHandler(logging.StreamHandler):
+
+    """ Print the messages to the current sys.stdout. """
+
+    def __init__(self) -> None:
+        super().__init__(sys.stdout)
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class DestinationFilter(logging.Filter):
+
+    """ Keep the records sent to a destination ("file" or "terminal"), records are sent to the file by default. """
+
+    def __init__(self, destination) -> None:
+        super().__init__()
+        self.destination = destination
+
+    def filter(self, record):
+        return self.destination in getattr(record, "destinations", ("file",))
 
 class LoggerWriter(object):
 
-    """ Logger class destinated for stdout and stderr messages. """
+    """
+    Logger class destinated for stdout and stderr messages.
+    Lines are split in linear time, the complete lines of a write are logged by batches
+    of batch_lines lines and an unterminated line is kept up to max_line characters.
+    tee: echo what is written to sys.stdout (True) or to a stream, nothing if False.
+    """
+
+    BATCH_LINES = 200
+    MAX_LINE = 64 * 1024
 
-    def __init__(self, logger) -> None:
+    def __init__(self, logger, tee=True, batch_lines=BATCH_LINES, max_line=MAX_LINE) -> None:
         self._logger = logger
-        self._buf = ""
+        self._tee = tee
+        self._batch_lines = batch_lines
+        self._max_line = max_line
+        # fragments of the current unterminated line
+        self._partial = []
+        self._partial_size = 0
 
     def write(self, buffer):
         """ Write each lines in the buffer with a logger. """
-        self._buf += buffer
-        while '\n' in self._buf:
-            index = self._buf.find('\n')
-            self._logger(self._buf[:index])
-            print(self._buf[:index], file=sys.stdout)
-            self._buf = self._buf[index + 1:]
+        if not buffer:
+            return 0
+        self._echo(buffer)
+        if '\n' not in buffer:
+            self._partial.append(buffer)
+            self._partial_size += len(buffer)
+            if self._partial_size >= self._max_line:
+                self.flush()
+            return len(buffer)
+        lines = buffer.split('\n')
+        if self._partial:
+            lines[0] = ''.join(self._partial) + lines[0]
+            self._partial = []
+            self._partial_size = 0
+        last = lines.pop()
+        for start in range(0, len(lines), self._batch_lines):
+            self._logger('\n'.join(lines[start:start + self._batch_lines]))
+        if last:
+            self._partial.append(last)
+            self._partial_size = len(last)
+            if self._partial_size >= self._max_line:
+                self.flush()
+        return len(buffer)
+
+    def writelines(self, lines):
+        """ Write an iterable of strings, as a single write. """
+        self.write(''.join(lines))
 
     def flush(self):
         """ Flush / reset the buffer of stdout or stderr. """
-        if self._buf != "":
-            self._logger(self._buf)
-            self._buf = ""
\ No newline at end of file
+        if self._partial:
+            self._logger(''.join(self._partial))
+            self._partial = []
+            self._partial_size = 0
+
+    def _echo(self, buffer):
+        stream = sys.stdout if self._tee is True else self._tee
+        # no echo to itself when it replaces sys.stdout
+        if stream and stream is not self:
+            stream.write(buffer)
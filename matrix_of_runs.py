@@ -1,5 +1,15 @@
+import argparse
+import copy
 import re
 import os
+import shutil
+import sys
+import tempfile
+
+import classes
+import common
+import timing
+import workflow
 
 
 class MatrixOfRuns():
@@ -119,28 +129,31 @@ class MatrixOfRuns():
             print('Parameters are invalid!')
             return False
 
-        if re.match(r'^[A-Z]{3}-\d{3}$', self.current_run_number) == None:
-            print('RUN_NUMBER format is invalid!')
-            return False
-
         rtn_val = self.check_strings_in_input_file()
         if rtn_val is False:
             return False
 
         return True
 
-    def update_parameter_file(self, param_vals):
+    def run_description(self, param_vals):
+        """
+        Description of the run using the given parameter values
+        """
+        return f"{self.description} {self.parameter_names}={param_vals}"
+
+    def update_parameter_file(self, param_vals, dst_path=None):
         """
-        Update the RUN_NUMBER in the parameter file
+        Write the parameter file of a run, with its DESCRIPTION and RUN_NUMBER,
+        to dst_path (default: update the parameter file in place)
         """
         with open(self.param_file_path, 'r') as file:
             lines = file.readlines()
 
-        with open(self.param_file_path, 'w') as file:
+        with open(dst_path or self.param_file_path, 'w') as file:
             for line in lines:
                 if line.strip().startswith("DESCRIPTION"):
                     parts = line.split(":", 1)
-                    updated_line = f"{parts[0]}:\t\t{self.description} {self.parameter_names}={param_vals}\n"
+                    updated_line = f"{parts[0]}:\t\t{self.run_description(param_vals)}\n"
                     file.write(updated_line)
                 elif line.strip().startswith("RUN_NUMBER"):
                     parts = line.split(":", 1)
@@ -149,9 +162,10 @@ class MatrixOfRuns():
                 else:
                     file.write(line)
 
-    def update_input_config_file(self, values):
+    def update_input_config_file(self, values, dst_path=None):
         """
-            Update parameter values in the input data file
+            Write the input data file with the given parameter values
+            to dst_path (default: update the input data file in place)
         """
         if len(self.parameter_names) != len(values):
             raise ValueError(
@@ -170,7 +184,7 @@ class MatrixOfRuns():
                     lines[i] = re.sub(r'^(.*=)\s*.*', rf'\1 {new_value}', line)
                     break
 
-        with open(self.config_file_path, 'w', encoding='utf-8') as f:
+        with open(dst_path or self.config_file_path, 'w', encoding='utf-8') as f:
             f.writelines(lines)
 
     @staticmethod
@@ -202,32 +216,121 @@ class MatrixOfRuns():
 
 def submit_multiple_jobs(parameter_file):
     """
+    Submit one run per parameter combination of the parameter file,
+    or a single run when no parameters are given
     """
     parameter_file = os.path.abspath(parameter_file)
     mat_obj = MatrixOfRuns(parameter_file)
     mat_obj.get_parameter_data()
     if len(mat_obj.parameter_values) == 0:
-        ## Call the main method here
-        # main(parameter_file)
         print('Submitting - NO PARAMETERS GIVEN')
-    else:
-        rtn_value = mat_obj.validate_parameters()
-        if rtn_value is False:
-            return None
+        workflow.main(parameter_file)
+        return None
 
-        # Submit multiple jobs
-        for param_vals in mat_obj.parameter_values:
-            mat_obj.update_parameter_file(param_vals)
-            mat_obj.update_input_config_file(param_vals)
-            new_run_num = mat_obj.increment_run_number(
-                mat_obj.current_run_number)
-            mat_obj.current_run_number = new_run_num
+    rtn_value = mat_obj.validate_parameters()
+    if rtn_value is False:
+        return None
+    return submit_batch(mat_obj)
 
-            ## Call the main method here
-            # main(parameter_file)
 
+def submit_batch(mat_obj):
+    """
+    Submit every run of the matrix in this process:
+    - workflow config, environment and parameters are checked once
+    - run numbers are allocated in one database transaction
+    - every Project is built before the first job is submitted
+    Each run uses staged copies of the parameter and input data files,
+    the user's files are never modified.
+    Returns the names of the submitted runs.
+    """
+    param_file_path = mat_obj.param_file_path
+    timing.reset()
+    workflow.initialize(param_file_path)
+    workflow_args = classes.ConfigParser(param_file_path).get_first_section("WORKFLOW")
+    classes.Uniq.parameter = param_file_path
+    classes.Uniq.user_dir = os.path.dirname(param_file_path)
+
+    # run numbers are allocated once the arguments are valid,
+    # each run sets its own run number on a copy of WA
+    WA = classes.WorkflowArgs()
+    WA.set_members(dict(workflow_args, RUN_NUMBER="000"))
+    if classes.Uniq.rerun:
+        common.simple_exit("Rerun is not available for a matrix of runs")
+
+    # imported here: pymysql is only loaded once run numbers are needed
+    import run_number_manager
+    params = run_number_manager.read_param(classes.Uniq.user_dir, os.path.basename(param_file_path))
+    if not params:
+        common.simple_exit("Could not read parameters.")
+    params_list = [dict(params, DESCRIPTION=mat_obj.run_description(param_vals))
+                   for param_vals in mat_obj.parameter_values]
+    run_numbers = run_number_manager.allocate_run_numbers(params_list)
+    if not run_numbers or not all(run_numbers):
+        common.simple_exit("Failed to generate or retrieve run numbers from the database.")
+
+    staging_dir = tempfile.mkdtemp(prefix="matrix_of_runs_")
+    runs = []
+    try:
+        for i, (param_vals, run_number) in enumerate(zip(mat_obj.parameter_values, run_numbers)):
+            run_staging_dir = os.path.join(staging_dir, str(i))
+            os.mkdir(run_staging_dir)
+            staged_parameter_file = os.path.join(run_staging_dir, os.path.basename(param_file_path))
+            staged_input_file = os.path.join(run_staging_dir, os.path.basename(mat_obj.config_file_path))
+            mat_obj.current_run_number = run_number
+            mat_obj.update_parameter_file(param_vals, staged_parameter_file)
+            mat_obj.update_input_config_file(param_vals, staged_input_file)
+            classes.Uniq.parameter = staged_parameter_file
+            classes.Uniq.input_data_file = staged_input_file
+
+            run_WA = copy.copy(WA)
+            run_WA.run_number = workflow.parse_run_number(run_number)
+            run_WA.description = mat_obj.run_description(param_vals)
+            P, hold_job_id = workflow.prepare_project(run_WA)
+            runs.append((run_WA, P, hold_job_id))
+
+        for run_WA, P, hold_job_id in runs:
+            workflow.submit_project(run_WA, P, hold_job_id)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        classes.Uniq.parameter = param_file_path
+        classes.Uniq.input_data_file = None
+
+    # one log and timing record for the whole batch, kept in every run folder
+    # as workflow.main does for a single run
+    logger = common.get_logger()
+    timing_file = timing.write_record(logger.log_file_path, parameter_file=param_file_path,
+                                      runs=[P.name for _, P, _ in runs])
+    move_batch_logs(logger, timing_file, [P.run_dir for _, P, _ in runs])
+    return [P.name for _, P, _ in runs]
+
+
+def move_batch_logs(logger, timing_file, run_dirs):
+    """Copies the batch log and timing record into every run folder but the first one, moves them there."""
+    # the queued records are written before the log is copied
+    logger.close()
+    for run_dir in run_dirs[1:]:
+        for path in (logger.log_file_path, timing_file):
+            try:
+                shutil.copyfile(path, os.path.join(run_dir, os.path.basename(path)))
+            except OSError as e:
+                logger.log_event("warning", f"Cannot copy {path} to {run_dir}: {e}")
+    logger.move_logs(run_dirs[0])
+    sys.stderr = logger.set_log("stderr")
+    try:
+        os.replace(timing_file, os.path.join(run_dirs[0], os.path.basename(timing_file)))
+    except OSError as e:
+        logger.log_event("warning", f"Cannot move {timing_file} to {run_dirs[0]}: {e}")
 
-if __name__ == "__main__":
 
-    # Example usage
-    submit_multiple_jobs(r'C:\Users\201083499\Documents\parameters.txt')
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('parameter_file', type=str, help="parameter file with PARAMETERS and PARAMETER_VALUES")
+    parser.add_argument('--refresh-lists', action='store_true', help="Ignore the cached solver versions and queues lists")
+    args = parser.parse_args()
+    if args.refresh_lists:
+        classes.Uniq.refresh_lists = True
+
+    try:
+        submit_multiple_jobs(args.parameter_file)
+    except common.WorkflowError:
+        exit(1)
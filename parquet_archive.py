@@ -0,0 +1,132 @@
+import os
+import tempfile
+
+import db_mapping
+
+# pyarrow, imported on first use by is_available
+pa = pq = None
+
+# Partitioned dataset root, default <project_root_dir>/_PARQUET next to the project folders
+ARCHIVE_DIR_NAME = "_PARQUET"
+# Rows converted to Arrow at a time
+ROW_GROUP_SIZE = 100000
+PARTITION_COLUMNS = ['PROJECT_CODE', 'TASK_CODE', 'RUN_NUMBER']
+
+
+def is_available():
+    """Imports pyarrow, an optional dependency slow to import: the archive is skipped without it."""
+    global pa, pq
+    if pq is None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            return False
+    return True
+
+
+def archive_root(job_folder):
+    """AEROX_PARQUET_DIR, or <project_root_dir>/_PARQUET for a <project_root_dir>/<PROJECT>/<RUN_CODE> job folder."""
+    root = os.environ.get("AEROX_PARQUET_DIR")
+    if root:
+        return root
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(job_folder))), ARCHIVE_DIR_NAME)
+
+
+def partition_dir(root, dataset, context):
+    """<root>/<dataset>/PROJECT_CODE=../TASK_CODE=../RUN_NUMBER=.. (hive partitioning)."""
+    return os.path.join(root, dataset, *(f"{column}={context[column]}" for column in PARTITION_COLUMNS))
+
+
+def archived_mappings(registry=db_mapping.REGISTRY):
+    """Numeric series are archived, the text tables stay in MariaDB only."""
+    return [mapping for mapping in registry if not mapping.as_text]
+
+
+def archive_file(mapping, file_path, source_file, context, root, row_group_size=ROW_GROUP_SIZE):
+    """
+    Writes the rows of one source file to <partition>/<source file>.parquet.
+    Skipped when the Parquet file is newer than the source. The file is replaced atomically.
+    Returns the number of rows written, None if skipped.
+    """
+    directory = partition_dir(root, mapping.table, context)
+    target = os.path.join(directory, source_file.replace(os.sep, "__") + ".parquet")
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(file_path):
+        return None
+
+    os.makedirs(directory, exist_ok=True)
+    # the partition columns are stored in the path
+    columns = mapping.context_columns + mapping.insert_columns
+    skipped = len(db_mapping.RUN_COLUMNS) - 1
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    writer = None
+    written = 0
+    try:
+        batch = []
+        rows = (values[:1] + values[1 + skipped:] for values in mapping.read_rows(file_path, context))
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= row_group_size:
+                writer = _write_batch(writer, tmp_path, ['RUN_CODE'] + columns, batch, mapping)
+                written += len(batch)
+                batch = []
+        if batch or writer is None:
+            writer = _write_batch(writer, tmp_path, ['RUN_CODE'] + columns, batch, mapping)
+            written += len(batch)
+        writer.close()
+        os.replace(tmp_path, target)
+        return written
+    except Exception:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_batch(writer, path, columns, batch, mapping):
+    data = {column: [row[i] for row in batch] for i, column in enumerate(columns)}
+    if writer is None:
+        writer = pq.ParquetWriter(path, _schema(columns, data, mapping))
+    writer.write_table(pa.Table.from_pydict(data, schema=writer.schema))
+    return writer
+
+
+def _schema(columns, data, mapping):
+    fields = []
+    for column in columns:
+        if column in mapping.float_columns:
+            column_type = pa.float64()
+        elif column == 'RUN_CODE' or column in mapping.context_columns:
+            column_type = pa.string()
+        else:
+            # e.g. ITERATION, inferred from the first batch
+            column_type = pa.array(data[column]).type
+            if pa.types.is_null(column_type):
+                column_type = pa.float64()
+        fields.append(pa.field(column, column_type))
+    return pa.schema(fields)
+
+
+def archive_registered_files(index, context, root=None):
+    """
+    Archives the numeric registered files found in a JobFolderIndex.
+    Returns {file path: rows written, None if up to date}, failures are printed.
+    """
+    results = {}
+    if not is_available():
+        print("pyarrow is not installed, Parquet archive skipped")
+        return results
+    if not all(context.get(column) for column in PARTITION_COLUMNS):
+        print("Incomplete RUN_CODE, Parquet archive skipped")
+        return results
+    root = root or archive_root(index.base_dir)
+    for mapping, file_path in db_mapping.find_registered_files(index, archived_mappings()):
+        try:
+            file_context = mapping.file_context(context, file_path)
+            results[file_path] = archive_file(mapping, file_path, os.path.relpath(file_path, index.base_dir),
+                                              file_context, root)
+        except Exception as e:
+            print(f"Error archiving {mapping.name} file {file_path}: {e}")
+    return results
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from typing import List, Sequence, Union
+
+# Default timeout in seconds of an external command
+DEFAULT_TIMEOUT: int = int(os.environ.get("AEROX_COMMAND_TIMEOUT", "600"))
+# Results kept in history, long running processes (job_monitor) must not keep every command output
+HISTORY_SIZE = 100
+
+
+class CommandResult:
+    """Outcome of an external command."""
+
+    def __init__(self, argv: Sequence[str], returncode: Union[int, None], stdout: str, stderr: str,
+                 wall_time: float, timed_out: bool = False, error: str = None) -> None:
+        self.argv = list(argv)
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.timed_out = timed_out
+        # set when the command could not be started
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"CommandResult({self.command_line}, returncode={self.returncode}, wall_time={self.wall_time:.3f}s)"
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and self.error is None
+
+    @property
+    def command_line(self) -> str:
+        return " ".join(self.argv)
+
+    def describe_failure(self) -> str:
+        if self.error is not None:
+            return f"Cannot run {self.command_line}: {self.error}"
+        if self.timed_out:
+            return f"Command timed out after {self.wall_time:.0f}s: {self.command_line}"
+        return f"Command failed with exit code {self.returncode}: {self.command_line}\n{self.stderr}"
+
+
+# Last commands run by the process, in completion order
+history = deque(maxlen=HISTORY_SIZE)
+# Commands run since the last reset_history
+commands_run = 0
+_lock = threading.Lock()
+
+
+def reset_history() -> None:
+    global commands_run
+    with _lock:
+        history.clear()
+        commands_run = 0
+
+
+def run(argv: Sequence[str], timeout: Union[float, None] = DEFAULT_TIMEOUT,
+        cwd: str = None, env: dict = None) -> CommandResult:
+    """
+    Runs argv without a shell and returns its CommandResult.
+    The command is killed when it runs longer than timeout seconds (None: no timeout).
+    Never raises for a failing command, check CommandResult.ok.
+    """
+    argv = [str(arg) for arg in argv]
+    start = time.monotonic()
+    try:
+        completed = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   universal_newlines=True, timeout=timeout, cwd=cwd, env=env)
+        result = CommandResult(argv, completed.returncode, completed.stdout, completed.stderr,
+                               time.monotonic() - start)
+    except subprocess.TimeoutExpired as e:
+        result = CommandResult(argv, None, _to_text(e.stdout), _to_text(e.stderr),
+                               time.monotonic() - start, timed_out=True)
+    except OSError as e:
+        result = CommandResult(argv, None, "", "", time.monotonic() - start, error=str(e))
+    global commands_run
+    with _lock:
+        history.append(result)
+        commands_run += 1
+    return result
+
+
+def run_many(commands: Sequence[Sequence[str]], timeout: Union[float, None] = DEFAULT_TIMEOUT,
+             max_workers: int = 4) -> List[CommandResult]:
+    """Runs independent commands concurrently, results are returned in the commands order."""
+    if not commands:
+        return []
+    # only loaded by the callers running commands concurrently
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(commands))) as executor:
+        return list(executor.map(lambda argv: run(argv, timeout), commands))
+
+
+def _to_text(output) -> str:
+    if output is None:
+        return ""
+    if isinstance(output, bytes):
+        return output.decode("utf-8", errors="replace")
+    return output
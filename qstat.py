@@ -0,0 +1,79 @@
+import os
+import time
+from typing import Dict, Union
+
+import process_runner
+
+QSTAT: str = os.environ.get("AEROX_QSTAT", "/opt/sge/bin/lx-amd64/qstat")
+QSTAT_TIMEOUT: int = 120
+# Age after which get_snapshot fetches qstat again
+DEFAULT_MAX_AGE: int = 30
+
+
+class QstatError(Exception):
+    """Raised when qstat cannot be run or fails."""
+
+
+def parse_qstat_output(output: str) -> Dict[str, str]:
+    """
+    Parses 'qstat -u' output into {job_id: state}.
+    Header and separator lines are ignored, the state is the fifth column (r, qw, hqw, Eqw...).
+    """
+    states = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) > 4 and fields[0].isdigit():
+            states[fields[0]] = fields[4]
+    return states
+
+
+class QstatSnapshot:
+    """State of the grid engine jobs at a given time, job state lookups are O(1)."""
+
+    def __init__(self, states: Dict[str, str], taken_at: float = None) -> None:
+        self.states = states
+        self.taken_at = time.time() if taken_at is None else taken_at
+
+    def __contains__(self, job_id) -> bool:
+        return str(job_id) in self.states
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.taken_at
+
+    def state(self, job_id) -> Union[str, None]:
+        """Returns the qstat state of the job, None if the job is not in the queue anymore."""
+        return self.states.get(str(job_id))
+
+    def is_queued(self, job_id) -> bool:
+        return str(job_id) in self.states
+
+    def is_error(self, job_id) -> bool:
+        state = self.state(job_id)
+        return state is not None and state.startswith("E")
+
+    @classmethod
+    def fetch(cls, user: str = "*") -> "QstatSnapshot":
+        """Runs qstat once and parses its output."""
+        result = process_runner.run([QSTAT, "-u", user], QSTAT_TIMEOUT)
+        if not result.ok:
+            raise QstatError(result.describe_failure())
+        return cls(parse_qstat_output(result.stdout))
+
+
+_snapshots: Dict[str, QstatSnapshot] = {}
+
+
+def get_snapshot(user: str = "*", max_age: float = DEFAULT_MAX_AGE, refresh: bool = False) -> QstatSnapshot:
+    """
+    Returns the snapshot shared by every job state lookup of the process.
+    qstat is only run again when the snapshot is older than max_age seconds or refresh is True.
+    """
+    snapshot = _snapshots.get(user)
+    if refresh or snapshot is None or snapshot.age > max_age:
+        snapshot = QstatSnapshot.fetch(user)
+        _snapshots[user] = snapshot
+    return snapshot
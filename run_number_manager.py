@@ -1,7 +1,9 @@
 import pymysql
 import os
-import pandas as pd
 from db_connection import get_db_connection
+import db_schema
+import db_table
+import timing
 
 def read_param(base_dir, target_file='parameters.txt'):
     """Reads parameters from the specified file."""
@@ -30,134 +32,155 @@ def get_run_number(base_dir):
     Main function to orchestrate reading params, updating the DB,
     and generating the run number.
     """
-    connection = get_db_connection()
-    if not connection:
-        print("Failed to get database connection.")
-        return None
-
     params = read_param(base_dir)
     if not params:
         print("Could not read parameters.")
-        connection.close()
         return None
 
-    Table_Auto_run_number = 'Auto_Run_Num'
+    run_numbers = allocate_run_numbers([params])
+    return run_numbers[0] if run_numbers else None
+
+@timing.timed("run_number")
+def allocate_run_numbers(params_list):
+    """
+    Inserts one Auto_Run_Num row per parameters dict (as returned by read_param)
+    and assigns their run numbers in a single transaction.
+    Returns the run numbers in the params_list order, None if the allocation failed.
+    """
+    connection = get_db_connection()
+    if not connection:
+        print("Failed to get database connection.")
+        return None
+
+    Table_Auto_run_number = db_table.Table_Auto_run_number
 
     try:
         cursor = connection.cursor()
-        
-        # Insert parameters into the database
-        mapped_params = {
-            'PROJECT_CODE': params['PROJECT_CODE'],
-            'TASK_CODE': params['TASK_CODE'],
-            'JOB_DESCRIPTION': params['DESCRIPTION'],
-            'SOLVER_VERSION': params['SOLVER_VERSION'],
-            'QUEUE_TYPE': params['QUEUE'],
-            'WORKFLOW_STEPS': params['WORKFLOW_STEPS'],
-            'TEMPLATE': params['TEMPLATE'],
-            'ITERATOR': params['ITERATOR']
-        }
-        df = pd.DataFrame([mapped_params])
-
-        for index, row in df.iterrows():
-            cursor.execute(f"""
-                INSERT INTO {Table_Auto_run_number}
-                (PROJECT_CODE, TASK_CODE, JOB_DESCRIPTION, SOLVER_VERSION, QUEUE_TYPE, WORKFLOW_STEPS, TEMPLATE, ITERATOR)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (row['PROJECT_CODE'], row['TASK_CODE'], row['JOB_DESCRIPTION'],
-                  row['SOLVER_VERSION'], row['QUEUE_TYPE'], row['WORKFLOW_STEPS'],
-                  row['TEMPLATE'], row['ITERATOR']))
+        db_schema.ensure_schema(cursor)
+        run_numbers = []
+        for params in params_list:
+            row_id = insert_parameters(cursor, Table_Auto_run_number, params)
+            run_numbers.append(assign_run_number(cursor, Table_Auto_run_number, row_id, params))
         connection.commit()
-        print("Parameter file has been processed and data inserted.")
-
-        # Assign run number
-        run_number = assign_run_number(cursor, connection, Table_Auto_run_number)
-        return run_number
+        print(f"{len(run_numbers)} parameter set(s) processed and data inserted.")
+        return run_numbers
 
     except Exception as e:
+        connection.rollback()
         print(f"An error occurred: {e}")
         return None
     finally:
         if connection:
             connection.close()
 
-def get_existing_runs(cursor, project_code, task_code):
-    """Fetches existing runs for a given project and task code."""
-    cursor.execute("""
-        SELECT * FROM Auto_Run_Num
-        WHERE PROJECT_CODE = %s AND TASK_CODE = %s AND RUN_NUMBER IS NOT NULL
-        ORDER BY id DESC
-    """, (project_code, task_code))
-    return cursor.fetchall()
+def insert_parameters(cursor, table_name, params):
+    """Inserts the parameters of a submission and returns the row id, the run number is assigned afterwards."""
+    cursor.execute(f"""
+        INSERT INTO {table_name}
+        (PROJECT_CODE, TASK_CODE, JOB_DESCRIPTION, SOLVER_VERSION, QUEUE_TYPE, WORKFLOW_STEPS, TEMPLATE, ITERATOR)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, (params['PROJECT_CODE'], params['TASK_CODE'], params['DESCRIPTION'],
+          params['SOLVER_VERSION'], params['QUEUE'], params['WORKFLOW_STEPS'],
+          params['TEMPLATE'], params['ITERATOR']))
+    return cursor.lastrowid
+
+def get_description_match(cursor, project_code, task_code, job_description):
+    """
+    Summarizes the numbered runs with the same project, task and job description
+    in one query on the (PROJECT_CODE, TASK_CODE, JOB_DESCRIPTION) index.
+    Returns None if there is none, else a dict with the latest run number and
+    whether any of these runs had a PRE step, a RUN step or an iterator.
+    The job description is compared exactly (case, trailing spaces, NULL matches NULL),
+    the plain comparison only narrows the index range.
+    """
+    cursor.execute(f"""
+        SELECT COUNT(*),
+               SUBSTRING_INDEX(GROUP_CONCAT(RUN_NUMBER ORDER BY id DESC), ',', 1),
+               MAX(UPPER(WORKFLOW_STEPS) LIKE '%%PRE%%'),
+               MAX(UPPER(WORKFLOW_STEPS) LIKE '%%RUN%%'),
+               MAX(ITERATOR IS NOT NULL AND ITERATOR <> '')
+        FROM {db_table.Table_Auto_run_number}
+        WHERE PROJECT_CODE = %s AND TASK_CODE = %s
+          AND JOB_DESCRIPTION <=> %s AND BINARY JOB_DESCRIPTION <=> %s
+          AND RUN_NUMBER IS NOT NULL
+    """, (project_code, task_code, job_description, job_description))
+    row = cursor.fetchone()
+    if not row or not row[0]:
+        return None
+    count, latest_run_number, pre_exists, run_exists, iterator_has_value = row
+    return {
+        'RUN_NUMBER': latest_run_number,
+        'PRE_EXISTS': bool(pre_exists),
+        'RUN_EXISTS': bool(run_exists),
+        'ITERATOR_HAS_VALUE': bool(iterator_has_value),
+    }
 
 def generate_run_number(cursor, project_code, task_code):
-    """Generates a new run number."""
-    cursor.execute("""
-        SELECT RUN_NUMBER FROM Auto_Run_Num
+    """
+    Generates a new run number from the project counter.
+    The counter row stays locked until the caller's transaction ends,
+    concurrent submissions of the same project wait instead of reusing the number.
+    """
+    return f"{project_code}-{task_code}-{next_run_sequence(cursor, project_code):03d}"
+
+def next_run_sequence(cursor, project_code):
+    """Increments and returns the project counter, seeding it from the run history on first use."""
+    counter_table = db_table.Table_Run_number_counter
+    select_counter = f"SELECT LAST_NUMBER FROM {counter_table} WHERE PROJECT_CODE = %s FOR UPDATE"
+    cursor.execute(select_counter, (project_code,))
+    row = cursor.fetchone()
+    if row is None:
+        # INSERT IGNORE: a concurrent submission may seed the counter first
+        cursor.execute(f"INSERT IGNORE INTO {counter_table} (PROJECT_CODE, LAST_NUMBER) VALUES (%s, %s)",
+                       (project_code, get_max_run_sequence(cursor, project_code)))
+        cursor.execute(select_counter, (project_code,))
+        row = cursor.fetchone()
+
+    number = row[0] + 1
+    cursor.execute(f"UPDATE {counter_table} SET LAST_NUMBER = %s WHERE PROJECT_CODE = %s",
+                   (number, project_code))
+    return number
+
+def get_max_run_sequence(cursor, project_code):
+    """Highest numeric suffix of the project run numbers, only used to seed a new counter."""
+    cursor.execute(f"""
+        SELECT COALESCE(MAX(CAST(SUBSTRING_INDEX(RUN_NUMBER, '-', -1) AS UNSIGNED)), 0)
+        FROM {db_table.Table_Auto_run_number}
         WHERE PROJECT_CODE = %s AND RUN_NUMBER IS NOT NULL
-        ORDER BY id DESC
     """, (project_code,))
-    all_runs = cursor.fetchall()
-
-    max_num = 0
-    for run in all_runs:
-        try:
-            parts = run[0].split('-')
-            num = int(parts[-1])
-            if num > max_num:
-                max_num = num
-        except (ValueError, IndexError):
-            continue
-
-    return f"{project_code}-{task_code}-{max_num + 1:03d}"
-
-def assign_run_number(cursor, connection, table_name):
-    """Assigns a run number based on the defined logic."""
-    cursor.execute(f"SELECT * FROM {table_name} ORDER BY id DESC LIMIT 1")
-    latest = cursor.fetchone()
-    if not latest:
-        print("No recent entry found.")
-        return None
+    row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
 
-    id, project_code, task_code, _, job_description, _, _, workflow_steps, _, iterator, *_ = latest
-    workflow_steps = workflow_steps.upper() if workflow_steps else ""
-    
-    previous_entries = get_existing_runs(cursor, project_code, task_code)
+def assign_run_number(cursor, table_name, row_id, params):
+    """Assigns a run number to the inserted row based on the defined logic."""
+    project_code, task_code = params['PROJECT_CODE'], params['TASK_CODE']
+    workflow_steps = params['WORKFLOW_STEPS'].upper() if params['WORKFLOW_STEPS'] else ""
+
+    jd_match = get_description_match(cursor, project_code, task_code, params['DESCRIPTION'])
     run_number = None
 
     # Decision Logic
     if workflow_steps in ['PRE', 'PRE RUN', 'ALL']:
-        jd_match = [entry for entry in previous_entries if entry[4] == job_description]
         if jd_match:
             run_number = "DUMMY_XXX_000"  # Job description already exists, assign fixed dummy run number
         else:
             run_number = generate_run_number(cursor, project_code, task_code) # Generate New run number
     
     elif workflow_steps in ['RUN', 'RUN POST']:
-        jd_match = [entry for entry in previous_entries if entry[4] == job_description]
-        if jd_match:
-            pre_exists = any('PRE' in (entry[7] or "").upper() for entry in jd_match)
-            run_exists = any('RUN' in (entry[7] or "").upper() for entry in jd_match)
-            iterator_has_value = any(entry[9] for entry in jd_match)
-
-            if pre_exists or (run_exists and iterator_has_value):
-                run_number = jd_match[0][3]
-            else:
-                run_number = generate_run_number(cursor, project_code, task_code)
+        if jd_match and (jd_match['PRE_EXISTS'] or (jd_match['RUN_EXISTS'] and jd_match['ITERATOR_HAS_VALUE'])):
+            run_number = jd_match['RUN_NUMBER']
         else:
             run_number = generate_run_number(cursor, project_code, task_code)
     elif workflow_steps == 'POST':
-        jd_match = [entry for entry in previous_entries if entry[4] == job_description]
         if jd_match:
-            run_number = jd_match[0][3]
+            run_number = jd_match['RUN_NUMBER']
         else:
             run_number = generate_run_number(cursor, project_code, task_code)
 
     if run_number:
-        cursor.execute(f"UPDATE {table_name} SET RUN_NUMBER = %s WHERE id = %s", (run_number, id))
-        connection.commit()
+        cursor.execute(f"UPDATE {table_name} SET RUN_NUMBER = %s WHERE id = %s", (run_number, row_id))
         print(f"RUN_NUMBER assigned: {run_number}")
     else:
         print("No RUN_NUMBER assigned based on logic.")
         
-    return run_number
\ No newline at end of file
+    return run_number
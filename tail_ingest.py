@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+import db_ingest
+import db_mapping
+import db_schema
+from db_connection import get_db_connection
+
+# Files ingested while their job is still running
+TAIL_FILES = ['residuals.csv', '0-Cumulated_Fx_iter.csv']
+# Step folders searched for the TAIL_FILES
+TAIL_STEPS = ['RUN', 'POST']
+# Byte offsets already ingested, stored in the job folder
+OFFSETS_FILE = ".INGEST_OFFSETS"
+
+
+def run_context(job_folder):
+    """RUN_COLUMNS values of a PROJECT-TASK-NUMBER job folder, None for another folder name."""
+    run_code = os.path.basename(os.path.normpath(job_folder))
+    parts = run_code.split('-')
+    if len(parts) != 3:
+        return None
+    return {'RUN_CODE': run_code, 'PROJECT_CODE': parts[0], 'TASK_CODE': parts[1], 'RUN_NUMBER': parts[2]}
+
+
+class TailIngester:
+    """
+    Ingests the rows appended to the TAIL_FILES of a job folder since the previous call.
+
+    The offset of the last complete line ingested is kept per file in OFFSETS_FILE, so each
+    call only reads the new bytes. A file that was replaced or truncated is ingested again
+    from the start, replacing its previous rows.
+    """
+
+    def __init__(self, job_folder, file_names=TAIL_FILES, steps=TAIL_STEPS) -> None:
+        self.job_folder = job_folder
+        self.file_names = file_names
+        self.steps = steps
+        self.offsets_path = os.path.join(job_folder, OFFSETS_FILE)
+        self.offsets = self._load_offsets()
+
+    def files(self):
+        """(mapping, file path) of the tail files present in the job folder."""
+        for step in self.steps:
+            for file_name in self.file_names:
+                path = os.path.join(self.job_folder, step, file_name)
+                if os.path.isfile(path):
+                    yield db_mapping.find_mapping(file_name), path
+
+    def ingest(self, connection, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+        """Returns the number of rows inserted."""
+        context = run_context(self.job_folder)
+        if context is None:
+            return 0
+        inserted = 0
+        for mapping, path in self.files():
+            inserted += self.ingest_file(connection, mapping, path, context, batch_size)
+        return inserted
+
+    def ingest_file(self, connection, mapping, path, context, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+        source_file = os.path.relpath(path, self.job_folder)
+        state = self.offsets.get(source_file, {})
+        stat = os.stat(path)
+        offset = state.get("offset", 0)
+        if state.get("inode", stat.st_ino) != stat.st_ino or stat.st_size < offset:
+            # file replaced or truncated
+            offset = 0
+        if stat.st_size == offset:
+            return 0
+
+        with open(path, "rb") as file:
+            file.seek(offset)
+            data = file.read(stat.st_size - offset)
+        # only complete lines, the last one may still be written
+        data = data[:data.rfind(b"\n") + 1]
+        skiprows = mapping.skiprows if offset == 0 else 0
+        if data.count(b"\n") <= skiprows:
+            return 0
+
+        file_context = mapping.file_context(context, path)
+        rows = mapping.read_rows(StringIO(data.decode("utf-8", errors="replace")), file_context, skiprows)
+        inserted = db_ingest.append_source_rows(connection, mapping.table, mapping.db_columns, rows,
+                                                context['RUN_CODE'], source_file, offset == 0, batch_size)
+        # saved once the rows are committed
+        self.offsets[source_file] = {"offset": offset + len(data), "inode": stat.st_ino}
+        self._save_offsets()
+        return inserted
+
+    def _load_offsets(self):
+        try:
+            with open(self.offsets_path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_offsets(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.job_folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(self.offsets, file)
+            os.replace(tmp_path, self.offsets_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def ingest_job_folder(job_folder, batch_size=db_ingest.DEFAULT_BATCH_SIZE):
+    """Ingests the new rows of the tail files of a job folder, returns the number of rows inserted."""
+    tables = [db_mapping.find_mapping(file_name).table for file_name in TAIL_FILES]
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            db_schema.ensure_ingest_schema(cursor, tables)
+        finally:
+            cursor.close()
+        return TailIngester(job_folder).ingest(connection, batch_size)
+    finally:
+        connection.close()
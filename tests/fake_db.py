@@ -0,0 +1,89 @@
+"""
+In-memory stand-in for the PyMySQL connection used by db_ingest.
+
+Only the statements of db_ingest.replace_source_rows / append_source_rows are understood;
+rows are kept per table as {column: value} dicts. Changes are undone by rollback.
+"""
+import copy
+import re
+
+import db_table
+
+
+class FakeConnection:
+
+    def __init__(self) -> None:
+        # {table: [{column: value}]}
+        self.tables = {}
+        # {(RUN_CODE, TABLE_NAME, SOURCE_FILE): (CONTENT_HASH, ROW_COUNT)}
+        self.manifest = {}
+        self.commits = 0
+        self._saved = None
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rows(self, table):
+        return self.tables.get(table, [])
+
+    def commit(self):
+        self._saved = None
+        self.commits += 1
+
+    def rollback(self):
+        if self._saved is not None:
+            self.tables, self.manifest = self._saved
+            self._saved = None
+
+    def close(self):
+        pass
+
+    def _begin(self):
+        if self._saved is None:
+            self._saved = copy.deepcopy((self.tables, self.manifest))
+
+
+class FakeCursor:
+
+    def __init__(self, connection) -> None:
+        self.connection = connection
+        self._result = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        connection = self.connection
+        connection._begin()
+        manifest = db_table.Table_Ingest_manifest
+        if sql.startswith(f"SELECT CONTENT_HASH FROM {manifest} "):
+            entry = connection.manifest.get(tuple(params))
+            self._result = [(entry[0],)] if entry else []
+        elif sql.startswith(f"INSERT INTO {manifest} "):
+            run_code, table, source_file, content_hash, row_count = params
+            connection.manifest[(run_code, table, source_file)] = (content_hash, row_count)
+        elif sql.startswith(f"DELETE FROM {manifest} "):
+            connection.manifest.pop(tuple(params), None)
+        elif sql.startswith("DELETE FROM "):
+            table = sql.split()[2]
+            run_code, source_file = params
+            legacy = "IS NULL" in sql
+
+            def deleted(row):
+                return row["RUN_CODE"] == run_code and (
+                    row["SOURCE_FILE"] == source_file or (legacy and row["SOURCE_FILE"] is None))
+            connection.tables[table] = [row for row in connection.rows(table) if not deleted(row)]
+        else:
+            raise NotImplementedError(sql)
+
+    def executemany(self, sql, rows):
+        match = re.match(r"INSERT INTO (\w+) \(([^)]*)\) VALUES", sql)
+        if match is None:
+            raise NotImplementedError(sql)
+        self.connection._begin()
+        columns = [column.strip() for column in match.group(2).split(",")]
+        self.connection.tables.setdefault(match.group(1), []).extend(dict(zip(columns, row)) for row in rows)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def close(self):
+        pass
@@ -0,0 +1,9 @@
+#!/bin/sh
+# Stand-in for 'qacct -j <job id>': prints data/qacct_<job id>.txt,
+# fails as qacct does for an unknown job.
+record="$(dirname "$0")/data/qacct_$2.txt"
+if [ "$1" != "-j" ] || [ ! -f "$record" ]; then
+    echo "error: job id $2 not found" >&2
+    exit 1
+fi
+cat "$record"
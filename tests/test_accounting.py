@@ -0,0 +1,81 @@
+import os
+import unittest
+from datetime import datetime, timedelta
+
+import accounting
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+FAKE_QACCT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_qacct.sh")
+
+
+def read_sample(job_id):
+    with open(os.path.join(DATA_DIR, f"qacct_{job_id}.txt")) as file:
+        return file.read()
+
+
+class ParseQacctOutputTest(unittest.TestCase):
+
+    def test_single_record(self):
+        records = [fields for fields in accounting.parse_qacct_output(read_sample(4241)) if fields]
+        self.assertEqual(len(records), 1)
+        fields = records[0]
+        self.assertEqual(fields['owner'], "jdoe")
+        self.assertEqual(fields['jobnumber'], "4241")
+        self.assertEqual(fields['qsub_time'], "Tue Mar 15 10:00:00 2022")
+        self.assertEqual(fields['failed'], "0")
+
+    def test_multiple_records(self):
+        records = [fields for fields in accounting.parse_qacct_output(read_sample(4242)) if fields]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['hostname'], "node07")
+        self.assertEqual(records[0]['failed'], "100 : assumedly after job")
+        self.assertEqual(records[1]['hostname'], "node09")
+
+    def test_record_fields(self):
+        fields = accounting.parse_qacct_output(read_sample(4241))[0]
+        record = accounting.record_from_fields("4241", fields)
+        self.assertEqual(record.job_id, "4241")
+        self.assertEqual(record.owner, "jdoe")
+        self.assertEqual(record.qsub_time, datetime(2022, 3, 15, 10, 0, 0))
+        self.assertEqual(record.start_time, datetime(2022, 3, 15, 10, 0, 5))
+        self.assertEqual(record.elapsed_time, timedelta(hours=1, minutes=30))
+        self.assertEqual(accounting.AccountingRecord.from_dict(record.to_dict()).to_dict(), record.to_dict())
+
+    def test_unset_dates(self):
+        fields = accounting.parse_qacct_output(read_sample(4242))[1]
+        record = accounting.record_from_fields("4242", fields)
+        self.assertEqual(record.start_time, datetime(2022, 3, 16, 9, 15, 0, 500000))
+        self.assertIsNone(accounting.parse_date("-/-"))
+        self.assertIsNone(accounting.record_from_fields("4242", {}).elapsed_time)
+
+
+class LookupTest(unittest.TestCase):
+
+    def setUp(self):
+        self._qacct = accounting.QACCT
+        accounting.QACCT = FAKE_QACCT
+
+    def tearDown(self):
+        accounting.QACCT = self._qacct
+
+    def test_lookup(self):
+        record = accounting.lookup(4241, use_cache=False)
+        self.assertEqual(record.owner, "jdoe")
+        self.assertEqual(record.end_time, datetime(2022, 3, 15, 11, 30, 5))
+
+    def test_lookup_rerun_uses_last_record(self):
+        record = accounting.lookup(4242, use_cache=False)
+        self.assertEqual(record.elapsed_time, timedelta(minutes=30, seconds=30))
+
+    def test_lookup_missing_job(self):
+        self.assertIsNone(accounting.lookup(9999, use_cache=False))
+
+    def test_lookup_many(self):
+        records = accounting.lookup_many([4241, "4242", 9999, None, 4241], use_cache=False)
+        self.assertEqual(list(records), ["4241", "4242", "9999"])
+        self.assertEqual(records["4242"].start_time, datetime(2022, 3, 16, 9, 15, 0, 500000))
+        self.assertIsNone(records["9999"])
+
+
+if __name__ == "__main__":
+    unittest.main()
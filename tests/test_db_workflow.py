@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import accounting
+import db_workflow
+from disk_cache import DiskCache
+from tests.fake_db import FakeConnection
+from tail_ingest import TailIngester
+
+FAKE_QACCT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_qacct.sh")
+
+
+def make_file(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+class JobTree:
+    """<root>/PRJ/PRJ-RTM-00x/{PRE,RUN,POST}, as laid out by core.copy_template."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.project = os.path.join(self.root, "PRJ")
+        self.run_1 = os.path.join(self.project, "PRJ-RTM-001")
+        for step in ("PRE", "RUN", "POST"):
+            make_file(os.path.join(self.run_1, step, "parameters.txt"), "WORKFLOW_STEPS: ALL\n")
+        make_file(os.path.join(self.run_1, "RUN", "residuals.csv"),
+                  "Iteration,Tdr,Tke,Continuity,X,Y,Z\n1,0.1,0.2,0.5,0.3,0.3,0.3\n")
+        make_file(os.path.join(self.run_1, "RUN", "StarccmFlex_4241.log"))
+        # submitted, no step folder yet
+        self.run_2 = os.path.join(self.project, "PRJ-RTM-002")
+        make_file(os.path.join(self.run_2, ".JOB_STEPS"), "PRE,101 ")
+        # failed step only
+        self.run_3 = os.path.join(self.project, "PRJ-RTM-003")
+        make_file(os.path.join(self.run_3, "RUN-FAILED", "parameters.txt"))
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+
+class FindJobFoldersTest(JobTree, unittest.TestCase):
+
+    def test_run_folder(self):
+        self.assertEqual(db_workflow.find_job_folders(self.run_1), [self.run_1])
+
+    def test_project_directory(self):
+        self.assertEqual(db_workflow.find_job_folders(self.project), [self.run_1, self.run_2, self.run_3])
+
+    def test_project_root(self):
+        self.assertEqual(db_workflow.find_job_folders(self.root), [self.run_1, self.run_2, self.run_3])
+
+    def test_step_folder_is_not_a_job_folder(self):
+        self.assertEqual(db_workflow.find_job_folders(os.path.join(self.run_1, "RUN")), [])
+
+    def test_missing_folder(self):
+        self.assertEqual(db_workflow.find_job_folders(os.path.join(self.root, "missing")), [])
+
+
+class ScannedJobTree(JobTree):
+    """JobTree scanned with the fake qacct, the Parquet archive and the qacct cache under the tree root."""
+
+    def setUp(self):
+        super().setUp()
+        self._qacct = accounting.QACCT, accounting._cache
+        accounting.QACCT = FAKE_QACCT
+        accounting._cache = DiskCache("qacct", cache_dir=self.root)
+        self._parquet_dir = os.environ.get("AEROX_PARQUET_DIR")
+        os.environ["AEROX_PARQUET_DIR"] = os.path.join(self.root, "_PARQUET")
+
+    def tearDown(self):
+        accounting.QACCT, accounting._cache = self._qacct
+        if self._parquet_dir is None:
+            del os.environ["AEROX_PARQUET_DIR"]
+        else:
+            os.environ["AEROX_PARQUET_DIR"] = self._parquet_dir
+        super().tearDown()
+
+
+class ScanJobFolderTest(ScannedJobTree, unittest.TestCase):
+    """The run folder found by find_job_folders is the base of the scan."""
+
+    def test_scan_run_folder(self):
+        [job_folder] = db_workflow.find_job_folders(self.run_1)
+        data = db_workflow.scan_job_folder(job_folder)
+        self.assertEqual(data.base_dir, self.run_1)
+        self.assertEqual(data.run_code, "PRJ-RTM-001")
+        self.assertEqual(data.context['RUN_NUMBER'], "001")
+        # job id from RUN/StarccmFlex_<job id>.log, owner from qacct
+        self.assertIn("4241", data.elapse_row)
+        self.assertIn("jdoe", data.elapse_row)
+        # manifest key relative to the run folder
+        self.assertEqual([source_file for _, _, source_file, _, _ in data.files],
+                         [os.path.join("RUN", "residuals.csv")])
+
+
+
+class WriteRegisteredFilesTest(ScannedJobTree, unittest.TestCase):
+    """Manifest keyed ingestion of the registered files of a run folder."""
+
+    def setUp(self):
+        super().setUp()
+        self.connection = FakeConnection()
+        self.residuals = os.path.join(self.run_1, "RUN", "residuals.csv")
+
+    def ingest(self):
+        data = db_workflow.scan_job_folder(self.run_1)
+        db_workflow.write_registered_files(self.connection, data)
+        return data
+
+    def residual_rows(self):
+        return self.connection.rows("Ext_Aero_Residuals")
+
+    def test_reingest_is_a_no_op(self):
+        data = self.ingest()
+        self.assertEqual((data.inserted, data.unchanged, data.errors), (1, 0, []))
+        rows = list(self.residual_rows())
+        data = self.ingest()
+        self.assertEqual((data.inserted, data.unchanged, data.errors), (0, 1, []))
+        self.assertEqual(self.residual_rows(), rows)
+
+    def test_changed_file_replaces_its_rows(self):
+        self.ingest()
+        with open(self.residuals, "a") as file:
+            file.write("2,0.1,0.2,0.4,0.3,0.3,0.3\n")
+        data = self.ingest()
+        self.assertEqual(data.inserted, 2)
+        self.assertEqual([row["ITERATION"] for row in self.residual_rows()], [1, 2])
+        self.assertEqual({row["SOURCE_FILE"] for row in self.residual_rows()}, {os.path.join("RUN", "residuals.csv")})
+
+    def test_final_ingestion_replaces_tail_rows(self):
+        # rows loaded while the job was running, then the ingestion of the finished job
+        with open(self.residuals, "a") as file:
+            file.write("2,0.1,0.2,0.4,0.3,0.3,0.3\n")
+        self.assertEqual(TailIngester(self.run_1).ingest(self.connection), 2)
+        self.ingest()
+        self.assertEqual([row["ITERATION"] for row in self.residual_rows()], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
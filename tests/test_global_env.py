@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import classes
+import common
+import core
+import process_runner
+from disk_cache import DiskCache
+
+
+class QuietLogger:
+
+    def log_event(self, levels, msg):
+        pass
+
+
+class GlobalEnvTest(unittest.TestCase):
+    """set_system_global_env called for several submissions of the same process (matrix, cleanup)."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.rc_path = os.path.join(self.tmp, "global_env.rc")
+        with open(self.rc_path, "w") as file:
+            file.write("export PATH=/opt/xf/bin:$PATH\nexport XF_HOME=/opt/xf\ncd /\n")
+        self._environ = dict(os.environ)
+        self._config = classes.Uniq.config
+        self._cache = core._global_env_cache
+        self._loggers = getattr(core, "logger", None), common.logger
+        config = classes.WorkflowConfig()
+        config._global_env = self.rc_path
+        classes.Uniq.config = config
+        core._global_env_cache = DiskCache("global_env", cache_dir=self.tmp)
+        core._inherited_env = None
+        core.set_log(QuietLogger())
+        common.logger = QuietLogger()
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self._environ)
+        classes.Uniq.config = self._config
+        core._global_env_cache = self._cache
+        core._inherited_env = None
+        core.set_log(self._loggers[0])
+        common.logger = self._loggers[1]
+        shutil.rmtree(self.tmp)
+
+    def test_sourced_once_per_process(self):
+        commands_run = process_runner.commands_run
+        for _ in range(4):
+            core.set_system_global_env()
+        self.assertEqual(process_runner.commands_run - commands_run, 1)
+        self.assertEqual(os.environ["PATH"], "/opt/xf/bin:" + self._environ["PATH"])
+        self.assertEqual(os.environ["XF_HOME"], "/opt/xf")
+
+    def test_cached_env(self):
+        core.set_system_global_env()
+        cached = core._global_env_cache.get(core.global_env_key(self.rc_path))
+        self.assertEqual(set(cached), {"PATH", "XF_HOME"})
+
+    def test_key_follows_inherited_env(self):
+        key = core.global_env_key(self.rc_path)
+        core.set_system_global_env()
+        self.assertEqual(core.global_env_key(self.rc_path), key)
+        # another process started from a different shell
+        core._inherited_env = None
+        os.environ["XF_LICENSE"] = "1999@license"
+        self.assertNotEqual(core.global_env_key(self.rc_path), key)
+
+
+if __name__ == "__main__":
+    unittest.main()
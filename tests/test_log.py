@@ -0,0 +1,56 @@
+import io
+import unittest
+
+from log import LoggerWriter
+
+
+class LoggerWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = []
+        self.echo = io.StringIO()
+        self.writer = LoggerWriter(self.records.append, tee=self.echo, batch_lines=3, max_line=16)
+
+    def test_complete_lines(self):
+        self.writer.write("first\nsecond\n")
+        self.assertEqual(self.records, ["first\nsecond"])
+
+    def test_line_split_across_writes(self):
+        self.writer.write("fir")
+        self.writer.write("st\nsec")
+        self.assertEqual(self.records, ["first"])
+        self.writer.write("ond\n")
+        self.assertEqual(self.records, ["first", "second"])
+
+    def test_batches(self):
+        self.writer.write("".join(f"line {i}\n" for i in range(7)))
+        self.assertEqual(self.records, ["line 0\nline 1\nline 2", "line 3\nline 4\nline 5", "line 6"])
+
+    def test_flush_logs_the_unterminated_line(self):
+        self.writer.write("no newline")
+        self.assertEqual(self.records, [])
+        self.writer.flush()
+        self.assertEqual(self.records, ["no newline"])
+        self.writer.flush()
+        self.assertEqual(self.records, ["no newline"])
+
+    def test_long_unterminated_line_is_bounded(self):
+        for _ in range(5):
+            self.writer.write("abcd")
+        self.assertEqual(self.records, ["abcdabcdabcdabcd"])
+        self.writer.write("\n")
+        self.assertEqual(self.records, ["abcdabcdabcdabcd", "abcd"])
+
+    def test_writelines_and_echo(self):
+        self.writer.writelines(["a\n", "b", "\n"])
+        self.assertEqual(self.records, ["a\nb"])
+        self.assertEqual(self.echo.getvalue(), "a\nb\n")
+
+    def test_no_echo(self):
+        writer = LoggerWriter(self.records.append, tee=False)
+        self.assertEqual(writer.write("quiet\n"), 6)
+        self.assertEqual(self.records, ["quiet"])
+
+
+if __name__ == "__main__":
+    unittest.main()
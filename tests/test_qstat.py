@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import classes
+import common
+import core
+import job_monitor
+import qstat
+
+QSTAT_OUTPUT = """\
+job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID
+-----------------------------------------------------------------------------------------------------------------
+  43079 0.55500 PRJ-RTM-00 jdoe         r     03/15/2022 10:00:05 aerox.q@node12                    32
+  43080 0.00000 PRJ-RTM-00 jdoe         hqw   03/15/2022 09:59:58                                    32
+  43081 0.00000 PRJ-RTM-00 jdoe         Eqw   03/15/2022 09:59:59                                     1
+"""
+
+
+class QuietLogger:
+
+    def log_event(self, levels, msg):
+        pass
+
+
+class ParseQstatOutputTest(unittest.TestCase):
+
+    def test_states(self):
+        self.assertEqual(qstat.parse_qstat_output(QSTAT_OUTPUT), {"43079": "r", "43080": "hqw", "43081": "Eqw"})
+
+    def test_empty_queue(self):
+        self.assertEqual(qstat.parse_qstat_output(""), {})
+
+    def test_snapshot_lookups(self):
+        snapshot = qstat.QstatSnapshot(qstat.parse_qstat_output(QSTAT_OUTPUT))
+        self.assertTrue(snapshot.is_queued(43079))
+        self.assertEqual(snapshot.state("43080"), "hqw")
+        self.assertTrue(snapshot.is_error("43081"))
+        self.assertFalse(snapshot.is_error("43079"))
+        self.assertIsNone(snapshot.state("1"))
+        self.assertFalse(snapshot.is_queued("1"))
+
+
+class GetHoldJobIdTest(unittest.TestCase):
+    """core.get_hold_job_id answered from a shared snapshot, for a RUN submission after a PRE step."""
+
+    def setUp(self):
+        self.run_dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.run_dir, "PRE"))
+        job = SimpleNamespace(software=SimpleNamespace(sim=None))
+        self.project = SimpleNamespace(run_dir=self.run_dir, jobs=[job])
+        self._state = classes.Uniq.steps, getattr(core, "logger", None), common.logger, dict(qstat._snapshots)
+        classes.Uniq.steps = ["RUN", "POST"]
+        core.set_log(QuietLogger())
+        common.logger = QuietLogger()
+        qstat._snapshots["*"] = qstat.QstatSnapshot(qstat.parse_qstat_output(QSTAT_OUTPUT))
+
+    def tearDown(self):
+        classes.Uniq.steps, logger, common.logger, snapshots = self._state
+        core.set_log(logger)
+        qstat._snapshots.clear()
+        qstat._snapshots.update(snapshots)
+        shutil.rmtree(self.run_dir)
+
+    def test_no_previous_job(self):
+        self.assertIsNone(core.get_hold_job_id(self.project))
+
+    def test_previous_job_running(self):
+        job_monitor.add_job_infos(self.run_dir, [("PRE", "43079")])
+        self.assertEqual(core.get_hold_job_id(self.project), "43079")
+
+    def test_previous_job_finished(self):
+        job_monitor.add_job_infos(self.run_dir, [("PRE", "42000")])
+        open(os.path.join(self.run_dir, "PRE", "FINISHED"), "w").close()
+        self.assertEqual(core.get_hold_job_id(self.project), "42000")
+
+    def test_previous_job_in_error(self):
+        job_monitor.add_job_infos(self.run_dir, [("PRE", "43081")])
+        with self.assertRaises(common.WorkflowError):
+            core.get_hold_job_id(self.project)
+
+    def test_previous_job_failed(self):
+        job_monitor.add_job_infos(self.run_dir, [("PRE", "42000")])
+        for flag in ("FINISHED", "FAILED"):
+            open(os.path.join(self.run_dir, "PRE", flag), "w").close()
+        with self.assertRaises(common.WorkflowError):
+            core.get_hold_job_id(self.project)
+
+    def test_previous_step_folder_missing(self):
+        os.rmdir(os.path.join(self.run_dir, "PRE"))
+        with self.assertRaises(common.WorkflowError):
+            core.get_hold_job_id(self.project)
+
+
+if __name__ == "__main__":
+    unittest.main()
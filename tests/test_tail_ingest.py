@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import tail_ingest
+from tail_ingest import TailIngester
+from tests.fake_db import FakeConnection
+
+HEADER = "Iteration,Tdr,Tke,Continuity,X,Y,Z\n"
+
+
+def residual_line(iteration):
+    return f"{iteration},0.1,0.2,0.5,0.3,0.3,0.3\n"
+
+
+class TailIngesterTest(unittest.TestCase):
+    """Residuals of a running job: <root>/PRJ-RTM-001/RUN/residuals.csv grows between two cycles."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.job_folder = os.path.join(self.root, "PRJ-RTM-001")
+        os.makedirs(os.path.join(self.job_folder, "RUN"))
+        self.residuals = os.path.join(self.job_folder, "RUN", "residuals.csv")
+        self.connection = FakeConnection()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def append(self, text):
+        with open(self.residuals, "a") as file:
+            file.write(text)
+
+    def iterations(self):
+        return [row["ITERATION"] for row in self.connection.rows("Ext_Aero_Residuals")]
+
+    def test_offsets_survive_a_restart(self):
+        self.append(HEADER + residual_line(1) + residual_line(2))
+        self.assertEqual(TailIngester(self.job_folder).ingest(self.connection), 2)
+        self.append(residual_line(3))
+        # new process: the offsets are read back from the job folder
+        self.assertEqual(TailIngester(self.job_folder).ingest(self.connection), 1)
+        self.assertEqual(TailIngester(self.job_folder).ingest(self.connection), 0)
+        self.assertEqual(self.iterations(), [1, 2, 3])
+        with open(os.path.join(self.job_folder, tail_ingest.OFFSETS_FILE)) as file:
+            offsets = json.load(file)
+        self.assertEqual(offsets[os.path.join("RUN", "residuals.csv")]["offset"], os.path.getsize(self.residuals))
+
+    def test_unterminated_line_waits(self):
+        self.append(HEADER + residual_line(1) + "2,0.1,0.2")
+        ingester = TailIngester(self.job_folder)
+        self.assertEqual(ingester.ingest(self.connection), 1)
+        self.append(",0.5,0.3,0.3,0.3\n")
+        self.assertEqual(ingester.ingest(self.connection), 1)
+        self.assertEqual(self.iterations(), [1, 2])
+
+    def test_replaced_file_is_ingested_again(self):
+        self.append(HEADER + residual_line(1) + residual_line(2) + residual_line(3))
+        TailIngester(self.job_folder).ingest(self.connection)
+        # restarted simulation: shorter file
+        os.remove(self.residuals)
+        self.append(HEADER + residual_line(1))
+        self.assertEqual(TailIngester(self.job_folder).ingest(self.connection), 1)
+        self.assertEqual(self.iterations(), [1])
+
+    def test_not_a_run_folder(self):
+        step_folder = os.path.join(self.job_folder, "RUN")
+        self.append(HEADER + residual_line(1))
+        self.assertEqual(TailIngester(step_folder).ingest(self.connection), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
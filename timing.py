@@ -0,0 +1,241 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, List
+
+import process_runner
+
+# Timing record written next to the run log: <log file without .log>.timing.json
+RECORD_SUFFIX = ".timing.json"
+# Entry points profiled by 'timing.py imports'
+ENTRY_POINTS = ["workflow", "cleanup", "matrix_of_runs", "job_monitor", "db_workflow"]
+
+
+class Span:
+    """One timed phase: wall time, external commands run and bytes copied while it was open."""
+
+    def __init__(self, name: str, depth: int) -> None:
+        self.name = name
+        self.depth = depth
+        self.start = time.monotonic()
+        self.duration = None
+        self._commands = process_runner.commands_run
+        self._bytes = _bytes_copied
+        self.subprocesses = 0
+        self.bytes_copied = 0
+
+    def close(self) -> None:
+        self.duration = time.monotonic() - self.start
+        self.subprocesses = process_runner.commands_run - self._commands
+        self.bytes_copied = _bytes_copied - self._bytes
+
+    def to_dict(self) -> dict:
+        return {"phase": self.name, "depth": self.depth, "duration": round(self.duration, 6),
+                "subprocesses": self.subprocesses, "bytes_copied": self.bytes_copied}
+
+
+# Spans closed since the last reset, in closing order
+spans: List[Span] = []
+_bytes_copied = 0
+_started_at = time.monotonic()
+_lock = threading.Lock()
+# open spans of each thread, nested spans are named parent/child
+_local = threading.local()
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block as the phase name."""
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    current = Span(f"{stack[-1].name}/{name}" if stack else name, len(stack))
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        stack.pop()
+        current.close()
+        with _lock:
+            spans.append(current)
+
+
+def timed(name: str):
+    """Decorator timing each call of the function as the phase name."""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_bytes_copied(size: int) -> None:
+    global _bytes_copied
+    with _lock:
+        _bytes_copied += size
+
+
+def reset() -> None:
+    """Forgets the spans, commands and bytes counted so far (e.g. before each run of a batch)."""
+    global _bytes_copied, _started_at
+    with _lock:
+        spans.clear()
+        _bytes_copied = 0
+        _started_at = time.monotonic()
+    process_runner.reset_history()
+
+
+def record(**fields) -> dict:
+    """Timing record of the spans closed since the last reset, fields are added as is."""
+    with _lock:
+        phases = [s.to_dict() for s in sorted(spans, key=lambda s: s.start)]
+        total = time.monotonic() - _started_at
+        bytes_copied = _bytes_copied
+    result = {"recorded_at": datetime.now().isoformat(timespec="seconds"), "total": round(total, 6),
+              "subprocesses": process_runner.commands_run, "bytes_copied": bytes_copied}
+    result.update(fields)
+    result["phases"] = phases
+    return result
+
+
+def record_path(log_file_path: str) -> str:
+    return os.path.splitext(log_file_path)[0] + RECORD_SUFFIX
+
+
+def write_record(log_file_path: str, **fields) -> str:
+    """Writes the timing record next to the run log, returns its path. A failure is only printed."""
+    path = record_path(log_file_path)
+    try:
+        with open(path, "w") as file:
+            json.dump(record(log=log_file_path, **fields), file, indent=1)
+    except OSError as e:
+        print(f"Cannot write the timing record {path}: {e}", file=sys.stderr)
+    return path
+
+
+def find_records(paths: List[str]) -> List[str]:
+    """Timing record files given directly or found under the given directories."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(RECORD_SUFFIX))
+        else:
+            found.append(path)
+    return found
+
+
+def aggregate(records: List[dict]) -> Dict[str, dict]:
+    """
+    Per phase statistics over several runs: number of spans, mean, median, p95 and max duration,
+    mean subprocesses and bytes copied. A phase timed several times in a run (batch) counts each span.
+    """
+    import statistics
+
+    by_phase: Dict[str, List[dict]] = {}
+    for run in records:
+        by_phase.setdefault("total", []).append({"duration": run["total"], "subprocesses": run["subprocesses"],
+                                                 "bytes_copied": run["bytes_copied"]})
+        for phase in run.get("phases", []):
+            by_phase.setdefault(phase["phase"], []).append(phase)
+    result = {}
+    for name, phases in by_phase.items():
+        durations = sorted(phase["duration"] for phase in phases)
+        result[name] = {
+            "count": len(phases),
+            "mean": statistics.fmean(durations),
+            "median": statistics.median(durations),
+            "p95": durations[min(len(durations) - 1, int(round(0.95 * (len(durations) - 1))))],
+            "max": durations[-1],
+            "subprocesses": statistics.fmean(phase["subprocesses"] for phase in phases),
+            "bytes_copied": statistics.fmean(phase["bytes_copied"] for phase in phases),
+        }
+    return result
+
+
+def format_aggregate(stats: Dict[str, dict]) -> str:
+    lines = [f"{'phase':<40} {'count':>5} {'mean':>9} {'median':>9} {'p95':>9} {'max':>9} {'cmds':>6} {'MB':>9}"]
+    for name, values in sorted(stats.items(), key=lambda item: -item[1]["mean"]):
+        lines.append(f"{name:<40} {values['count']:>5} {values['mean']:>9.3f} {values['median']:>9.3f} "
+                     f"{values['p95']:>9.3f} {values['max']:>9.3f} {values['subprocesses']:>6.1f} "
+                     f"{values['bytes_copied'] / 1e6:>9.2f}")
+    return "\n".join(lines)
+
+
+def profile_imports(module: str, runs: int = 3) -> List[tuple]:
+    """
+    Imports module in a fresh interpreter with -X importtime, runs times.
+    Returns the (self, cumulative, name) import times in microseconds of the fastest run,
+    the module itself last.
+    """
+    best = None
+    for _ in range(runs):
+        result = process_runner.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                    cwd=os.path.dirname(os.path.abspath(__file__)))
+        if not result.ok:
+            raise RuntimeError(result.describe_failure())
+        times = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "[us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            times.append((int(self_us), int(cumulative_us), name.strip()))
+        if times and (best is None or times[-1][1] < best[-1][1]):
+            best = times
+    return best or []
+
+
+def format_imports(module: str, times: List[tuple], top: int) -> str:
+    total = times[-1][1] if times else 0
+    lines = [f"{module}: {total / 1000:.1f} ms import time"]
+    for self_us, cumulative_us, name in sorted(times[:-1], key=lambda item: -item[0])[:top]:
+        lines.append(f"  {self_us / 1000:>7.1f} ms self {cumulative_us / 1000:>7.1f} ms cumulative  {name}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Workflow timing records")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    aggregate_parser = subparsers.add_parser("aggregate", help="per phase statistics over several runs")
+    aggregate_parser.add_argument("paths", nargs="+",
+                                  help=f"{RECORD_SUFFIX} files or directories searched recursively")
+    aggregate_parser.add_argument("--json", action="store_true", help="print the statistics as JSON")
+    imports_parser = subparsers.add_parser("imports", help="import time of the entry points, in a fresh interpreter")
+    imports_parser.add_argument("modules", nargs="*", default=ENTRY_POINTS,
+                                help=f"modules to import (default: {' '.join(ENTRY_POINTS)})")
+    imports_parser.add_argument("--top", type=int, default=10, help="slowest imports listed per module")
+    imports_parser.add_argument("--runs", type=int, default=3, help="imports per module, the fastest is kept")
+    args = parser.parse_args()
+
+    if args.command == "imports":
+        for module in args.modules:
+            try:
+                print(format_imports(module, profile_imports(module, args.runs), args.top))
+            except RuntimeError as e:
+                print(f"{module}: {e}", file=sys.stderr)
+        return
+
+    records = []
+    for path in find_records(args.paths):
+        try:
+            with open(path) as file:
+                records.append(json.load(file))
+        except (OSError, ValueError) as e:
+            print(f"Skipped {path}: {e}", file=sys.stderr)
+    if not records:
+        parser.exit(1, "No timing record found\n")
+    stats = aggregate(records)
+    print(json.dumps(stats, indent=1) if args.json else format_aggregate(stats))
+
+
+if __name__ == "__main__":
+    main()
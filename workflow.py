@@ -1,11 +1,28 @@
-from lib2to3.pgen2.token import AT
 import sys 
 import os 
 import core
 import common 
 import classes 
 import argparse
-import run_number_manager # Import the new run number manager
+import timing
+
+class SubmissionResult:
+	""" Outcome of a submission: run name and folder, job ids in submission order (PRE, RUN, POST). """
+
+	def __init__(self, run_name, run_dir, job_ids, log_file=None, timing_file=None) -> None:
+		self.run_name = run_name
+		self.run_dir = run_dir
+		self.job_ids = job_ids
+		self.log_file = log_file
+		self.timing_file = timing_file
+
+	def __repr__(self) -> str:
+		return "SubmissionResult({0}, job_ids={1})".format(self.run_name, self.job_ids)
+
+	@property
+	def last_job_id(self):
+		""" Job to wait for before running a dependent job. """
+		return self.job_ids[-1] if self.job_ids else None
 
 def set_log(copylogger : common.Log ):
 	global logger 
@@ -16,13 +33,10 @@ def setup_parser(parser:argparse.ArgumentParser):
     parser.add_argument('parameter_file', type=str, help="parameter file")
     parser.add_argument('-c', '--cleanup', action='store_true', help="Run workflow to clean meshed file")
     parser.add_argument('-d', '--depend', type=int, nargs=1, metavar="<jobId>", help="Dependency: waits for job <jobId> to complete before running, make no sence if -c is not present")
+    parser.add_argument('--refresh-lists', action='store_true', help="Ignore the cached solver versions and queues lists")
 
-def main(parameter_file):
-
-	#######################
-	# INITIALIZE WORKFLOW #
-	#######################
-	parameter_file = os.path.abspath(parameter_file) 
+def initialize(parameter_file):
+	""" Set the log, the workflow config and the global env, once per process. """
 	common.set_log(parameter_file) 
 	set_log(common.get_logger())
 	core.set_log(common.get_logger())
@@ -31,36 +45,19 @@ def main(parameter_file):
 	core.set_workflow_config()
 	core.set_system_global_env() 
 
-	########################### 
-	# SET WORKFLOW PARAMETERS # 
-	###########################
-	workflow_args = classes.ConfigParser(parameter_file).get_first_section("WORKFLOW")
-	classes.Uniq.parameter = parameter_file
-	classes.Uniq.user_dir = os.path.dirname(parameter_file)  
-
-	# ---- GET AUTOMATED RUN NUMBER FROM DATABASE ----
-	run_number_from_db = run_number_manager.get_run_number(classes.Uniq.user_dir)
-	if not run_number_from_db:
-		common.simple_exit("Failed to generate or retrieve run number from the database.")
-	
-	# Extract only the numeric part for the workflow
+def parse_run_number(run_number_from_db):
+	""" Extract only the numeric part of the run number for the workflow. """
 	try:
 		run_number_parts = run_number_from_db.split('-')
 		if len(run_number_parts) == 3:
-			workflow_args['RUN_NUMBER'] = run_number_parts[2]
-		else:
-			# Fallback for unexpected format
-			workflow_args['RUN_NUMBER'] = run_number_from_db
+			return run_number_parts[2]
+		# Fallback for unexpected format
+		return run_number_from_db
 	except Exception as e:
 		common.simple_exit(f"Could not parse the run number received from database: {run_number_from_db}. Error: {e}")
-	# ------------------------------------------------
-
-	############################# 
-	# CHECK WORKFLOW PARAMETERS # 
-	############################# 
-	WA = classes.WorkflowArgs()
-	WA.set_members(workflow_args) 
 
+def prepare_project(WA):
+	""" Create the job folders of the run and copy / link their files, return the project and the job id to wait for. """
 	################################### 
 	# CHECK / RETRIEVE WORKFLOW FILES # 
 	###################################
@@ -88,7 +85,9 @@ def main(parameter_file):
 		# SYMLINK # 
 		###########
 		core.sim_file_handler(P)   
+	return P, hold_job_id
 
+def submit_project(WA, P, hold_job_id):
 	###############
 	# SUBMIT JOBS #  
 	###############
@@ -98,12 +97,73 @@ def main(parameter_file):
 	else:
 		submit_job.submit_job(hold_job_id)
 
-	core.set_cron_job(P)
+	core.set_job_monitor(P)
+
+def main(parameter_file):
+
+	#######################
+	# INITIALIZE WORKFLOW #
+	#######################
+	parameter_file = os.path.abspath(parameter_file) 
+	timing.reset()
+	initialize(parameter_file)
+
+	########################### 
+	# SET WORKFLOW PARAMETERS # 
+	###########################
+	workflow_args = classes.ConfigParser(parameter_file).get_first_section("WORKFLOW")
+	classes.Uniq.parameter = parameter_file
+	classes.Uniq.user_dir = os.path.dirname(parameter_file)  
+
+	# ---- GET AUTOMATED RUN NUMBER FROM DATABASE ----
+	# imported here: pymysql is only loaded once a run number is needed
+	import run_number_manager
+	run_number_from_db = run_number_manager.get_run_number(classes.Uniq.user_dir)
+	if not run_number_from_db:
+		common.simple_exit("Failed to generate or retrieve run number from the database.")
+	workflow_args['RUN_NUMBER'] = parse_run_number(run_number_from_db)
+	# ------------------------------------------------
+
+	############################# 
+	# CHECK WORKFLOW PARAMETERS # 
+	############################# 
+	WA = classes.WorkflowArgs()
+	WA.set_members(workflow_args) 
+
+	P, hold_job_id = prepare_project(WA)
+	submit_project(WA, P, hold_job_id)
 	
 	if not classes.Uniq.rerun:
 		logger.move_logs(P.run_dir) 
 		sys.stderr = logger.set_log("stderr")
 
+	##########
+	# TIMING # 
+	##########
+	timing_file = timing.write_record(logger.log_file_path, parameter_file=parameter_file, run_dir=P.run_dir)
+	logger.log_event("info", "Timing record: {0}".format(timing_file))
+	return SubmissionResult(P.name, P.run_dir, [job.id for job in P.jobs], logger.log_file_path, timing_file)
+
+def submit(parameter_file, cleanup=False, previous_job_id=None, refresh_lists=False) -> SubmissionResult:
+	"""
+	Submit the run of a parameter file in this process, as the workflow.py command line does.
+	The global state is reset for each call, the disk caches (option lists, global env) are kept.
+	Raises common.WorkflowError when the job cannot be submitted.
+	"""
+	if previous_job_id is not None and not cleanup:
+		raise common.WorkflowError("A previous job id is only used by a cleanup submission")
+	classes.Uniq.reset()
+	classes.Uniq.cleanup = cleanup
+	classes.Uniq.refresh_lists = refresh_lists
+	if previous_job_id is not None:
+		classes.Uniq.previous_job_id = str(previous_job_id)
+	# main redirects stderr to the submission log
+	stderr = sys.stderr
+	try:
+		return main(parameter_file)
+	finally:
+		sys.stderr = stderr
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     setup_parser(parser)
@@ -111,11 +171,13 @@ if __name__ == "__main__":
     if args.depend and not args.cleanup:
         print("option -d without -c make no sence.\nJob not submitted")
         exit(1)
-    if args.cleanup:
-        classes.Uniq.cleanup = True
+    previous_job_id = None
     if args.depend:
-        classes.Uniq.previous_job_id = str(args.depend[0])
-        print("previous job id:", classes.Uniq.previous_job_id)
+        previous_job_id = str(args.depend[0])
+        print("previous job id:", previous_job_id)
 
-    main(args.parameter_file)
+    try:
+        submit(args.parameter_file, args.cleanup, previous_job_id, args.refresh_lists)
+    except common.WorkflowError:
+        exit(1)
 